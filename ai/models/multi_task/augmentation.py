@@ -0,0 +1,214 @@
+import math
+import torch
+import torch.nn.functional as F
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def images_to_float(images: torch.Tensor) -> torch.Tensor:
+    """Converts a collated uint8 batch to float in [0, 1]; float batches pass through."""
+    return images.float().div_(255.0) if images.dtype == torch.uint8 else images
+
+
+def _normalizer(width: float, height: float, device) -> torch.Tensor:
+    """Maps pixel coordinates of a (height, width) image to affine_grid's [-1, 1] range."""
+    return torch.tensor([[2.0 / width, 0, -1], [0, 2.0 / height, -1], [0, 0, 1]], device=device)
+
+
+def _warp(images: torch.Tensor, forward: torch.Tensor, output_size: int) -> torch.Tensor:
+    """Resamples each image through its input->output pixel matrix into an output_size square."""
+    _, channels, height, width = images.shape
+    # affine_grid maps output to input in normalised coordinates
+    theta = (_normalizer(width, height, images.device) @ torch.linalg.inv(forward)
+             @ torch.linalg.inv(_normalizer(output_size, output_size, images.device)))
+    grid = F.affine_grid(theta[:, :2], [len(images), channels, output_size, output_size], align_corners=False)
+    return F.grid_sample(images, grid, mode='bilinear', padding_mode='zeros', align_corners=False)
+
+
+def _transform_boxes(boxes: torch.Tensor, forward: torch.Tensor, output_size: int,
+                     min_visibility: float) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Maps box corners, takes their bounding box and flags boxes left mostly outside the output."""
+    if len(boxes) == 0:
+        return boxes, torch.zeros(0, dtype=torch.bool, device=boxes.device)
+    forward = forward.to(boxes.device)
+    x1, y1, x2, y2 = boxes.unbind(1)
+    corners = torch.stack([
+        torch.stack([x1, y1], 1), torch.stack([x2, y1], 1),
+        torch.stack([x1, y2], 1), torch.stack([x2, y2], 1)
+    ], dim=1)  # (N, 4, 2)
+    mapped = corners @ forward[:2, :2].T + forward[:2, 2]
+    new_boxes = torch.cat([mapped.min(dim=1).values, mapped.max(dim=1).values], dim=1)
+
+    full_area = (new_boxes[:, 2] - new_boxes[:, 0]) * (new_boxes[:, 3] - new_boxes[:, 1])
+    new_boxes = new_boxes.clamp(0, output_size)
+    clipped_area = (new_boxes[:, 2] - new_boxes[:, 0]) * (new_boxes[:, 3] - new_boxes[:, 1])
+    keep = (clipped_area > 0) & (clipped_area >= min_visibility * full_area.clamp(min=1e-6))
+    return new_boxes, keep
+
+
+def _update_target(target: Dict[str, Any], boxes: torch.Tensor, keep: torch.Tensor) -> Dict[str, Any]:
+    boxes = boxes[keep].to(target['boxes'].device)
+    keep = keep.to(target['labels'].device)
+    new_target = dict(target)
+    new_target['boxes'] = boxes
+    new_target['labels'] = target['labels'][keep]
+    new_target['iscrowd'] = target['iscrowd'][keep]
+    new_target['area'] = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    new_target['has_bbox'] = len(boxes) > 0
+    return new_target
+
+
+def _normalize(images: torch.Tensor, mean: Optional[Sequence[float]], std: Optional[Sequence[float]]) -> torch.Tensor:
+    if mean is None or std is None:
+        return images
+    mean = torch.tensor(mean, device=images.device).view(1, -1, 1, 1)
+    std = torch.tensor(std, device=images.device).view(1, -1, 1, 1)
+    return (images - mean) / std
+
+
+class BatchAugmentation:
+    """
+    Box-aware augmentation applied to a whole collated batch at once, replacing the
+    per-sample albumentations train pipeline (RandomResizedCrop, HorizontalFlip, Rotate,
+    ColorJitter, Normalize) in DataLoader workers.
+
+    Takes (B, 3, H, W) uint8 images and the list of detection targets, and returns
+    (B, 3, output_size, output_size) normalised float images with `boxes`, `area`, `labels`,
+    `iscrowd` and `has_bbox` updated consistently. Flips run on the uint8 tensor; the
+    random-resized crop and rotation/scale/translation are composed into one matrix per
+    sample, so a single `grid_sample` produces the small output directly.
+    """
+    def __init__(
+        self,
+        output_size: int = 224,
+        crop_scale: Tuple[float, float] = (0.8, 1.0),
+        crop_ratio: Tuple[float, float] = (3 / 4, 4 / 3),
+        flip_prob: float = 0.5,
+        affine_prob: float = 0.3,
+        max_rotation: float = 10.0,
+        scale_range: Tuple[float, float] = (0.9, 1.1),
+        max_translate: float = 0.05,
+        intensity_prob: float = 0.5,
+        brightness: float = 0.1,
+        contrast: float = 0.1,
+        min_visibility: float = 0.2,
+        mean: Optional[Sequence[float]] = IMAGENET_MEAN,
+        std: Optional[Sequence[float]] = IMAGENET_STD
+    ):
+        self.output_size = output_size
+        self.crop_scale = crop_scale
+        self.crop_ratio = crop_ratio
+        self.flip_prob = flip_prob
+        self.affine_prob = affine_prob
+        self.max_rotation = max_rotation
+        self.scale_range = scale_range
+        self.max_translate = max_translate
+        self.intensity_prob = intensity_prob
+        self.brightness = brightness
+        self.contrast = contrast
+        self.min_visibility = min_visibility
+        self.mean = mean
+        self.std = std
+
+    def __call__(self, images: torch.Tensor, det_targets: List[Dict[str, Any]]) -> Tuple[torch.Tensor, List[Dict[str, Any]]]:
+        batch_size, _, height, width = images.shape
+        device = images.device
+        boxes = [t['boxes'].to(device) for t in det_targets]
+
+        # --- Horizontal flip (on uint8) ---
+        flip = torch.rand(batch_size, device=device) < self.flip_prob
+        if flip.any():
+            images = torch.where(flip[:, None, None, None], images.flip(-1), images)
+            boxes = [torch.stack([width - b[:, 2], b[:, 1], width - b[:, 0], b[:, 3]], dim=1) if f else b
+                     for b, f in zip(boxes, flip.tolist())]
+
+        # --- Random-resized crop composed with rotation/scale/translation ---
+        apply_affine = torch.rand(batch_size, device=device) < self.affine_prob
+        forward = self._sample_affine(batch_size, apply_affine) @ self._sample_crop(batch_size, height, width, device)
+
+        images = _warp(images_to_float(images), forward, self.output_size)
+        boxes = [_transform_boxes(b, m, self.output_size, self.min_visibility) for b, m in zip(boxes, forward)]
+
+        # --- Intensity: brightness and contrast ---
+        apply_intensity = (torch.rand(batch_size, device=device) < self.intensity_prob).float()[:, None, None, None]
+        if apply_intensity.any():
+            contrast = 1.0 + (torch.rand(batch_size, 1, 1, 1, device=device) * 2 - 1) * self.contrast * apply_intensity
+            brightness = (torch.rand(batch_size, 1, 1, 1, device=device) * 2 - 1) * self.brightness * apply_intensity
+            mean = images.mean(dim=(1, 2, 3), keepdim=True)
+            images = ((images - mean) * contrast + mean + brightness).clamp_(0.0, 1.0)
+
+        images = _normalize(images, self.mean, self.std)
+        return images, [_update_target(t, b, keep) for t, (b, keep) in zip(det_targets, boxes)]
+
+    def _sample_crop(self, batch_size, height, width, device):
+        """Per-sample matrices mapping a random crop (area/aspect as in RandomResizedCrop) onto the output square."""
+        area = torch.empty(batch_size, device=device).uniform_(*self.crop_scale)
+        log_ratio = torch.empty(batch_size, device=device).uniform_(math.log(self.crop_ratio[0]), math.log(self.crop_ratio[1]))
+        ratio = torch.exp(log_ratio)
+        crop_w = (width * torch.sqrt(area * ratio)).clamp(max=width)
+        crop_h = (height * torch.sqrt(area / ratio)).clamp(max=height)
+        x0 = torch.rand(batch_size, device=device) * (width - crop_w)
+        y0 = torch.rand(batch_size, device=device) * (height - crop_h)
+
+        sx, sy = self.output_size / crop_w, self.output_size / crop_h
+        crop = torch.zeros(batch_size, 3, 3, device=device)
+        crop[:, 0, 0], crop[:, 0, 2] = sx, -sx * x0
+        crop[:, 1, 1], crop[:, 1, 2] = sy, -sy * y0
+        crop[:, 2, 2] = 1.0
+        return crop
+
+    def _sample_affine(self, batch_size, mask):
+        """Per-sample output-space rotation/scale/translation matrices (identity where masked out)."""
+        device = mask.device
+        size = float(self.output_size)
+        angle = (torch.rand(batch_size, device=device) * 2 - 1) * math.radians(self.max_rotation)
+        scale = torch.empty(batch_size, device=device).uniform_(*self.scale_range)
+        tx = (torch.rand(batch_size, device=device) * 2 - 1) * self.max_translate * size
+        ty = (torch.rand(batch_size, device=device) * 2 - 1) * self.max_translate * size
+        angle, tx, ty = angle * mask, tx * mask, ty * mask
+        scale = torch.where(mask, scale, torch.ones_like(scale))
+
+        cos, sin = torch.cos(angle) * scale, torch.sin(angle) * scale
+        c = size / 2.0
+        # p_out = R * S * (p_in - c) + c + t
+        affine = torch.zeros(batch_size, 3, 3, device=device)
+        affine[:, 0, 0], affine[:, 0, 1] = cos, -sin
+        affine[:, 1, 0], affine[:, 1, 1] = sin, cos
+        affine[:, 0, 2] = c - cos * c + sin * c + tx
+        affine[:, 1, 2] = c - sin * c - cos * c + ty
+        affine[:, 2, 2] = 1.0
+        return affine
+
+
+class BatchEvalTransform:
+    """
+    Deterministic counterpart of BatchAugmentation for validation batches, matching the
+    albumentations val pipeline: resize to `resize_size`, center-crop `output_size`, normalise.
+    """
+    def __init__(
+        self,
+        output_size: int = 224,
+        resize_size: int = 256,
+        mean: Optional[Sequence[float]] = IMAGENET_MEAN,
+        std: Optional[Sequence[float]] = IMAGENET_STD
+    ):
+        self.output_size = output_size
+        self.resize_size = resize_size
+        self.mean = mean
+        self.std = std
+
+    def __call__(self, images: torch.Tensor, det_targets: List[Dict[str, Any]]) -> Tuple[torch.Tensor, List[Dict[str, Any]]]:
+        batch_size, _, height, width = images.shape
+        offset = (self.resize_size - self.output_size) / 2.0
+        sx, sy = self.resize_size / width, self.resize_size / height
+        forward = torch.tensor([[sx, 0, -offset], [0, sy, -offset], [0, 0, 1]], device=images.device)
+        forward = forward.expand(batch_size, 3, 3)
+
+        images = _normalize(_warp(images_to_float(images), forward, self.output_size), self.mean, self.std)
+        targets = []
+        for target in det_targets:
+            boxes, keep = _transform_boxes(target['boxes'], forward[0], self.output_size, min_visibility=0.0)
+            targets.append(_update_target(target, boxes, keep))
+        return images, targets
@@ -0,0 +1,78 @@
+import numpy as np
+import torch
+from torchvision.ops import box_iou
+from tqdm import tqdm
+from src.augmentation import images_to_float
+
+def collect_cascade_statistics(model, data_loader, device, iou_threshold=0.5, score_threshold=0.05,
+                               batch_transform=None):
+    """
+    Runs the ungated model once and records, per image, the classifier probabilities and,
+    per ground-truth box, whether the full detector found it (a same-class prediction
+    with IoU >= `iou_threshold`). `batch_transform` should match the one used by `evaluate`.
+    """
+    model.eval()
+    all_probs, gt_records = [], []
+
+    with torch.no_grad():
+        for images, _, det_targets in tqdm(data_loader, desc="Calibrating"):
+            images = images.to(device)
+            if batch_transform is not None:
+                images, det_targets = batch_transform(images, det_targets)
+            cls_output, det_output = model(images_to_float(images), mode='both')
+            probs = torch.sigmoid(cls_output).cpu().numpy()
+
+            for target, pred, image_probs in zip(det_targets, det_output, probs):
+                image_idx = len(all_probs)
+                all_probs.append(image_probs)
+                pred_boxes, pred_scores, pred_labels = pred['boxes'].cpu(), pred['scores'].cpu(), pred['labels'].cpu()
+
+                for box, label in zip(target['boxes'], target['labels']):
+                    mask = (pred_labels == label) & (pred_scores >= score_threshold)
+                    hit = bool(mask.any()) and box_iou(box[None], pred_boxes[mask]).max().item() >= iou_threshold
+                    # Detector labels are 1-indexed (0 is background)
+                    gt_records.append((image_idx, int(label) - 1, hit))
+
+    return np.stack(all_probs), gt_records
+
+
+def calibrate_cascade_thresholds(model, data_loader, device, classes, recall_tolerance=0.02, iou_threshold=0.5,
+                                 batch_transform=None):
+    """
+    Picks, for each class, the highest probability threshold whose gated detection recall
+    stays within `recall_tolerance` (absolute) of the ungated detector's recall.
+    Classes without ground-truth boxes are never gated in (threshold = inf).
+    Returns (thresholds tensor, per-class report).
+    """
+    probs, gt_records = collect_cascade_statistics(model, data_loader, device, iou_threshold,
+                                                     batch_transform=batch_transform)
+    thresholds = np.full(len(classes), np.inf, dtype=np.float32)
+    report = {}
+
+    for cls_idx, cls_name in enumerate(classes):
+        records = [(img, hit) for img, c, hit in gt_records if c == cls_idx]
+        if not records:
+            continue
+
+        hit_probs = np.sort([probs[img, cls_idx] for img, hit in records if hit])
+        full_recall = len(hit_probs) / len(records)
+        allowed_misses = int(np.floor(recall_tolerance * len(records) + 1e-9))
+        if allowed_misses < len(hit_probs):
+            thresholds[cls_idx] = hit_probs[allowed_misses]
+
+        gated_recall = np.sum(hit_probs >= thresholds[cls_idx]) / len(records)
+        report[cls_name] = {
+            'threshold': float(thresholds[cls_idx]),
+            'full_recall': full_recall,
+            'gated_recall': gated_recall,
+            'num_boxes': len(records)
+        }
+
+    detector_rate = float(np.mean((probs >= thresholds).any(axis=1)))
+    print(f"Cascade runs the detector on {100 * detector_rate:.1f}% of images")
+    for cls_name, stats in report.items():
+        print(f"  {cls_name}: threshold {stats['threshold']:.3f}, "
+              f"recall {stats['full_recall']:.3f} -> {stats['gated_recall']:.3f} ({stats['num_boxes']} boxes)")
+
+    report['detector_rate'] = detector_rate
+    return torch.from_numpy(thresholds), report
@@ -0,0 +1,58 @@
+import torch
+from src.checkpointing import AsyncCheckpointManager
+
+def _snapshot(obj):
+    """Recursively copies tensors to host memory so training can keep mutating the originals."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: _snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_snapshot(v) for v in obj)
+    return obj
+
+
+class CheckpointManager(AsyncCheckpointManager):
+    """Checkpoints model, optimizer, scheduler and epoch state for the PyTorch training loop."""
+    EXTENSION = 'pth'
+
+    def _dump(self, obj, path):
+        torch.save(obj, path)
+
+    def _load(self, path):
+        return torch.load(path, map_location='cpu')
+
+    def save(self, epoch, model, optimizer, lr_scheduler, metric, best_model_path=None):
+        """
+        Queues a checkpoint for `epoch` (0-indexed, completed). Returns True if `metric` is a
+        new best, in which case `best.pth` and, optionally, a weights-only `best_model_path` are written.
+        """
+        is_best = self._update_best(metric)
+        state = _snapshot({
+            'epoch': epoch,
+            'model_state_dict': model.state_dict(),
+            'optimizer_state_dict': optimizer.state_dict(),
+            'scheduler_state_dict': lr_scheduler.state_dict(),
+            'metric': metric,
+            'best_metric': self.best_metric
+        })
+        best_extras = [(state['model_state_dict'], best_model_path)] if best_model_path is not None else []
+        self._submit(state, epoch, is_best, best_extras)
+        return is_best
+
+    def restore(self, model, optimizer, lr_scheduler, path=None):
+        """
+        Loads the latest (or given) checkpoint into the model, optimizer and scheduler.
+        Returns the epoch to resume from, or 0 if there is nothing to resume.
+        """
+        path = path or self.latest_checkpoint()
+        if path is None:
+            print(f"No checkpoint found in {self.checkpoint_dir}, starting from scratch")
+            return 0
+
+        state = self.load(path)
+        model.load_state_dict(state['model_state_dict'])
+        optimizer.load_state_dict(state['optimizer_state_dict'])
+        lr_scheduler.load_state_dict(state['scheduler_state_dict'])
+        print(f"Resumed from {path} (epoch {state['epoch'] + 1}, best metric {self.best_metric:.4f})")
+        return state['epoch'] + 1
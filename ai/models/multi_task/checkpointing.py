@@ -0,0 +1,130 @@
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from contextlib import suppress
+
+class AsyncCheckpointManager(ABC):
+    """
+    Framework-agnostic core of the training checkpoint managers. Subclasses snapshot
+    state to host memory and implement `_dump`/`_load`; this class writes snapshots on a
+    background thread with atomic renames, keeps the last `keep_last` epoch checkpoints
+    plus `best.<extension>`, and allows at most one write in flight at a time.
+
+    Unless `resume=True`, checkpoints already in `checkpoint_dir` are removed on start so a
+    fresh run can never be resumed from (or prune against) files left by an earlier run.
+    """
+    EXTENSION = None
+
+    def __init__(self, checkpoint_dir, keep_last=3, mode='min', resume=False):
+        self.checkpoint_dir = checkpoint_dir
+        self.keep_last = keep_last
+        self.mode = mode
+        self.best_metric = float('inf') if mode == 'min' else float('-inf')
+        self.checkpoint_pattern = re.compile(rf'checkpoint_epoch(\d+)\.{self.EXTENSION}$')
+        self._thread = None
+        self._error = None
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+        if resume:
+            # The resumed run owns the checkpoints it left behind
+            self._written = self._epoch_checkpoints()
+        else:
+            self._clear()
+            self._written = []
+
+    # --- Subclass hooks ---
+    @abstractmethod
+    def _dump(self, obj, path):
+        """Serialises `obj` to `path`; runs on the writer thread."""
+
+    @abstractmethod
+    def _load(self, path):
+        """Deserialises the object stored at `path`."""
+
+    # --- Paths ---
+    @property
+    def best_path(self):
+        return os.path.join(self.checkpoint_dir, f'best.{self.EXTENSION}')
+
+    def _epoch_path(self, epoch):
+        return os.path.join(self.checkpoint_dir, f'checkpoint_epoch{epoch:04d}.{self.EXTENSION}')
+
+    def _epoch_checkpoints(self):
+        files = [f for f in os.listdir(self.checkpoint_dir) if self.checkpoint_pattern.match(f)]
+        files.sort(key=lambda f: int(self.checkpoint_pattern.match(f).group(1)))
+        return [os.path.join(self.checkpoint_dir, f) for f in files]
+
+    def latest_checkpoint(self):
+        checkpoints = self._epoch_checkpoints()
+        return checkpoints[-1] if checkpoints else None
+
+    def _clear(self):
+        stale = self._epoch_checkpoints() + [self.best_path]
+        for path in stale:
+            # Another process sharing the directory may have removed it already
+            with suppress(FileNotFoundError):
+                os.remove(path)
+
+    # --- Writing ---
+    def is_better(self, metric):
+        return metric < self.best_metric if self.mode == 'min' else metric > self.best_metric
+
+    def _update_best(self, metric):
+        is_best = self.is_better(metric)
+        if is_best:
+            self.best_metric = metric
+        return is_best
+
+    def _submit(self, state, epoch, is_best, best_extras=()):
+        """Hands a host-memory snapshot to the writer thread; `best_extras` are (obj, path) pairs written on a new best."""
+        self.wait()
+        self._thread = threading.Thread(
+            target=self._write, args=(state, epoch, is_best, best_extras), name='checkpoint-writer', daemon=True
+        )
+        self._thread.start()
+
+    def _atomic_dump(self, obj, path):
+        """Writes to a temporary file in the same directory, then renames it over `path`."""
+        tmp_path = f"{path}.tmp"
+        self._dump(obj, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _write(self, state, epoch, is_best, best_extras):
+        try:
+            path = self._epoch_path(epoch)
+            self._atomic_dump(state, path)
+            if path not in self._written:
+                self._written.append(path)
+            if is_best:
+                self._atomic_dump(state, self.best_path)
+                for obj, extra_path in best_extras:
+                    self._atomic_dump(obj, extra_path)
+            # Only prune checkpoints this run wrote (or resumed from)
+            while len(self._written) > self.keep_last:
+                with suppress(FileNotFoundError):
+                    os.remove(self._written.pop(0))
+        except Exception as e:
+            self._error = e
+
+    def wait(self):
+        """Blocks until the pending write finishes, re-raising any error it hit."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    # --- Reading ---
+    def load(self, path=None):
+        """Loads the given checkpoint, or the latest epoch checkpoint; returns None if there is none."""
+        path = path or self.latest_checkpoint()
+        if path is None:
+            return None
+        state = self._load(path)
+        self.best_metric = state['best_metric']
+        return state
+
+    def load_best(self):
+        return self._load(self.best_path) if os.path.exists(self.best_path) else None
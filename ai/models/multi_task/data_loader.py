@@ -5,7 +5,9 @@ from PIL import Image
 from pathlib import Path
 from typing import List, Dict, Any, Tuple, Optional
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, DataLoader
+from torch.utils.data.distributed import DistributedSampler
+from sklearn.model_selection import train_test_split
 
 # Define class list as a constant for clarity and easy access
 CLASSES: List[str] = [
@@ -29,12 +31,15 @@ class ChestXrayDataset(Dataset):
         base_dir: str | Path,
         bbox_dict: Optional[Dict[str, Any]] = None,
         transform: Optional[callable] = None,
-        mode: str = 'both'
+        mode: str = 'both',
+        uint8_images: bool = False
     ):
         self.base_dir = Path(base_dir)
         self.bbox_dict = bbox_dict if bbox_dict is not None else {}
         self.transform = transform
         self.mode = mode
+        # Return raw uint8 tensors and leave augmentation/float conversion to a batch stage (see augmentation.py)
+        self.uint8_images = uint8_images
         self.classes = CLASSES
         self.class_to_idx = CLASS_TO_IDX
 
@@ -89,6 +94,8 @@ class ChestXrayDataset(Dataset):
             image = transformed['image']
             bboxes = transformed.get('bboxes', [])
             det_labels = transformed.get('labels', [])
+        elif self.uint8_images:
+            image = torch.from_numpy(np.array(image)).permute(2, 0, 1)
         else:
             image = torch.from_numpy(np.array(image)).permute(2, 0, 1).float() / 255.0
 
@@ -126,4 +133,75 @@ class ChestXrayDataset(Dataset):
                 'area': torch.zeros((0,), dtype=torch.float32),
                 'iscrowd': torch.zeros((0,), dtype=torch.int64),
                 'has_bbox': False
-            }
\ No newline at end of file
+            }
+
+
+def collate_fn(batch):
+    """Custom collate function for handling variable-sized detection targets."""
+    if len(batch[0]) == 2:  # Mode is either 'classification' or 'detection'
+        if isinstance(batch[0][1], dict):  # Mode is 'detection'
+            images, targets = zip(*batch)
+            return torch.stack(images, 0), list(targets)
+        return torch.utils.data.dataloader.default_collate(batch)
+    # Mode is 'both'
+    images, cls_targets, det_targets = zip(*batch)
+    return torch.stack(images, 0), torch.stack(cls_targets, 0), list(det_targets)
+
+
+def load_bbox_dict(bbox_csv_path: str | Path) -> Dict[str, List[Dict[str, Any]]]:
+    """Parses BBox_List_2017.csv into {image name: [{'label', 'bbox': [x, y, w, h]}, ...]}."""
+    bbox_df = pd.read_csv(bbox_csv_path)
+    bbox_df.columns = [col.strip() for col in bbox_df.columns]
+
+    bbox_dict: Dict[str, List[Dict[str, Any]]] = {}
+    for row in bbox_df.itertuples(index=False):
+        img_name, label, x, y, w, h = row[:6]
+        bbox_dict.setdefault(img_name, []).append({
+            'label': label,
+            'bbox': [float(x), float(y), float(w), float(h)]
+        })
+    return bbox_dict
+
+
+def get_dataloaders(
+    data_path: str | Path,
+    batch_size: int,
+    train_transform: Optional[callable] = None,
+    val_transform: Optional[callable] = None,
+    num_workers: int = 4,
+    distributed: bool = False,
+    random_seed: int = 42,
+    uint8_images: bool = False
+) -> Tuple[DataLoader, DataLoader, List[str]]:
+    """
+    Builds train/validation loaders from the NIH directory layout with a patient-level split.
+    With `distributed=True` each rank reads its own shard through a DistributedSampler;
+    call `train_loader.sampler.set_epoch(epoch)` every epoch to reshuffle.
+    With `uint8_images=True` (and no transforms) batches are uint8 for a BatchAugmentation stage.
+    """
+    data_path = Path(data_path)
+    df = pd.read_csv(data_path / 'Data_Entry_2017.csv')
+    df = df[~df['Finding Labels'].str.contains('No Finding')]
+    bbox_dict = load_bbox_dict(data_path / 'BBox_List_2017.csv')
+
+    patient_ids = df['Patient ID'].unique()
+    train_ids, holdout_ids = train_test_split(patient_ids, test_size=0.25, random_state=random_seed)
+    val_ids, _ = train_test_split(holdout_ids, test_size=0.65, random_state=random_seed)
+
+    train_dataset = ChestXrayDataset(df[df['Patient ID'].isin(train_ids)], data_path, bbox_dict, train_transform,
+                                     uint8_images=uint8_images)
+    val_dataset = ChestXrayDataset(df[df['Patient ID'].isin(val_ids)], data_path, bbox_dict, val_transform,
+                                   uint8_images=uint8_images)
+
+    train_sampler = DistributedSampler(train_dataset, shuffle=True, seed=random_seed) if distributed else None
+    val_sampler = DistributedSampler(val_dataset, shuffle=False) if distributed else None
+
+    train_loader = DataLoader(
+        train_dataset, batch_size=batch_size, shuffle=train_sampler is None, sampler=train_sampler,
+        num_workers=num_workers, collate_fn=collate_fn
+    )
+    val_loader = DataLoader(
+        val_dataset, batch_size=batch_size, shuffle=False, sampler=val_sampler,
+        num_workers=num_workers, collate_fn=collate_fn
+    )
+    return train_loader, val_loader, CLASSES
@@ -0,0 +1,157 @@
+import os
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from tqdm import tqdm
+from src.metrics import calculate_classification_metrics, calculate_detection_map
+from src.augmentation import images_to_float
+
+def setup_distributed(backend='gloo'):
+    """
+    Initialises the process group from the environment set by `torchrun` and splits
+    the node's cores evenly between local ranks. Returns (rank, world_size).
+    """
+    dist.init_process_group(backend=backend)
+    local_world_size = int(os.environ.get('LOCAL_WORLD_SIZE', 1))
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // local_world_size))
+    return dist.get_rank(), dist.get_world_size()
+
+
+def cleanup_distributed():
+    if dist.is_initialized():
+        dist.destroy_process_group()
+
+
+def is_main_process():
+    return not dist.is_initialized() or dist.get_rank() == 0
+
+
+def broadcast_resume_state(start_epoch, optimizer, lr_scheduler):
+    """
+    Shares rank 0's resume point with every rank. Only rank 0 reads checkpoints, so ranks
+    without access to its checkpoint directory still start at the same epoch with the same
+    optimizer and scheduler state. Model weights follow when DDP broadcasts them on wrap.
+    """
+    main = is_main_process()
+    state = [start_epoch, optimizer.state_dict(), lr_scheduler.state_dict()] if main else [None, None, None]
+    dist.broadcast_object_list(state, src=0)
+    start_epoch, optimizer_state, scheduler_state = state
+    if not main and start_epoch > 0:
+        optimizer.load_state_dict(optimizer_state)
+        lr_scheduler.load_state_dict(scheduler_state)
+    return start_epoch
+
+
+class MultiTaskTrainingStep(nn.Module):
+    """
+    Computes the full multi-task loss in a single forward pass so every rank runs
+    exactly one forward/backward per step, whether or not its batch has boxes.
+    The detector only sees the images that have boxes; on ranks where there are none
+    its parameters go unused and DDP (find_unused_parameters=True) reduces zeros for them.
+    """
+    def __init__(self, model, cls_criterion):
+        super(MultiTaskTrainingStep, self).__init__()
+        self.model = model
+        self.cls_criterion = cls_criterion
+
+    def forward(self, images, cls_targets, det_targets):
+        cls_output = self.model(images, mode='classification')
+        losses = {'classification_loss': self.cls_criterion(cls_output, cls_targets)}
+
+        valid_det_idxs = [i for i, t in enumerate(det_targets) if t['has_bbox']]
+        if valid_det_idxs:
+            valid_det_targets = [det_targets[i] for i in valid_det_idxs]
+            det_losses = self.model(images[valid_det_idxs], valid_det_targets, mode='detection')
+            losses['rpn_loss'] = det_losses['loss_objectness'] + det_losses['loss_rpn_box_reg']
+            losses['roi_loss'] = det_losses['loss_classifier'] + det_losses['loss_box_reg']
+
+        losses['total_loss'] = sum(losses.values())
+        return losses
+
+
+def wrap_model_for_ddp(model, cls_criterion):
+    return DistributedDataParallel(MultiTaskTrainingStep(model, cls_criterion), find_unused_parameters=True)
+
+
+def _reduce_mean(values, device):
+    """Averages per-rank (sum, count) pairs across all ranks."""
+    stats = torch.tensor([float(np.sum(values)), float(len(values))], dtype=torch.float64, device=device)
+    dist.all_reduce(stats)
+    return (stats[0] / stats[1]).item() if stats[1] > 0 else 0.0
+
+
+def train_one_epoch_ddp(ddp_step, data_loader, optimizer, device, batch_transform=None):
+    """Runs a single epoch of DDP training and returns losses averaged over all ranks."""
+    ddp_step.train()
+    logged = {k: [] for k in ['classification_loss', 'rpn_loss', 'roi_loss', 'total_loss']}
+
+    for images, cls_targets, det_targets in tqdm(data_loader, desc="Training", disable=not is_main_process()):
+        images = images.to(device)
+        if batch_transform is not None:
+            images, det_targets = batch_transform(images, det_targets)
+        images = images_to_float(images)
+        cls_targets = cls_targets.to(device)
+        det_targets = [{k: v.to(device) if isinstance(v, torch.Tensor) else v for k, v in t.items()}
+                       for t in det_targets]
+
+        optimizer.zero_grad()
+        losses = ddp_step(images, cls_targets, det_targets)
+        losses['total_loss'].backward()
+        optimizer.step()
+
+        for k, v in losses.items():
+            logged[k].append(v.item())
+
+    return {k: _reduce_mean(v, device) for k, v in logged.items()}
+
+
+def evaluate_ddp(model, cls_criterion, data_loader, device, classes, batch_transform=None):
+    """
+    Runs validation on each rank's shard, gathers predictions from all ranks and
+    computes the same metrics as `evaluate` over the full (de-duplicated) set.
+    DistributedSampler pads shards with repeated samples; those are dropped by image_id.
+    """
+    model.eval()
+    local = []
+
+    with torch.no_grad():
+        for images, cls_targets, det_targets in tqdm(data_loader, desc="Validating", disable=not is_main_process()):
+            images = images.to(device)
+            if batch_transform is not None:
+                images, det_targets = batch_transform(images, det_targets)
+            cls_output, det_output = model(images_to_float(images), mode='both')
+            for i, (target, pred) in enumerate(zip(det_targets, det_output)):
+                det = None
+                if target['has_bbox']:
+                    det = ((target['boxes'].numpy(), target['labels'].numpy()),
+                           (pred['boxes'].cpu().numpy(), pred['scores'].cpu().numpy(), pred['labels'].cpu().numpy()))
+                local.append((int(target['image_id']), cls_targets[i].numpy(), cls_output[i].cpu().numpy(), det))
+
+    gathered = [None] * dist.get_world_size()
+    dist.all_gather_object(gathered, local)
+    samples = {}
+    for rank_samples in gathered:
+        for sample in rank_samples:
+            samples.setdefault(sample[0], sample)
+    samples = [samples[k] for k in sorted(samples)]
+
+    cls_targets = np.stack([s[1] for s in samples])
+    cls_logits = np.stack([s[2] for s in samples])
+    cls_loss = cls_criterion(torch.from_numpy(cls_logits), torch.from_numpy(cls_targets)).item()
+    cls_preds = 1.0 / (1.0 + np.exp(-cls_logits))
+
+    dets = [s[3] for s in samples if s[3] is not None]
+    cls_metrics = calculate_classification_metrics([cls_targets], [cls_preds], classes)
+    det_aps = calculate_detection_map([d[0] for d in dets], [d[1] for d in dets])
+
+    return {
+        'classification_loss': cls_loss,
+        'mean_auc': cls_metrics['mean_auc'],
+        'mean_ap_cls': cls_metrics['mean_ap_cls'],
+        'mean_ap_det': np.nanmean(list(det_aps.values())) if det_aps else 0.0,
+        'aucs': cls_metrics['aucs'],
+        'aps_cls': cls_metrics['aps'],
+        'aps_det': det_aps
+    }
@@ -1,3 +1,4 @@
+import torch
 import torch.nn as nn
 from torchvision.models.detection import FasterRCNN
 from torchvision.models.detection.anchor_utils import AnchorGenerator
@@ -92,4 +93,51 @@ class MultiTaskModel(nn.Module):
                     return det_output
 
                 # for 'both' mode
-                return cls_output, det_output
\ No newline at end of file
+                return cls_output, det_output
+
+    def _detector_transform_is_identity(self, images, image_list):
+        """True when the detector's resize/normalize leaves the classifier input unchanged."""
+        transform = self.detector.transform
+        return (tuple(image_list.tensors.shape) == tuple(images.shape)
+                and all(m == 0 for m in transform.image_mean)
+                and all(s == 1 for s in transform.image_std))
+
+    def cascade_forward(self, images, thresholds):
+        """
+        Confidence-gated inference: runs the classification head on the whole batch and
+        the detector only on images where some class probability reaches its threshold.
+        Detections are kept only for the classes that passed the gate. Backbone features
+        are reused for the detector when its transform is a no-op on the input; otherwise
+        only the gated subset is re-encoded. Must be called in eval mode.
+        """
+        features = self.shared_backbone(images)
+        cls_output = self.classifier(self.cls_pool(features))
+
+        class_gate = torch.sigmoid(cls_output) >= thresholds.to(cls_output.device)
+        gated_idxs = class_gate.any(dim=1).nonzero(as_tuple=True)[0].tolist()
+
+        det_output = [{
+            'boxes': images.new_zeros((0, 4)),
+            'scores': images.new_zeros((0,)),
+            'labels': torch.zeros((0,), dtype=torch.int64, device=images.device)
+        } for _ in range(len(images))]
+
+        if gated_idxs:
+            subset = images[gated_idxs]
+            original_sizes = [tuple(img.shape[-2:]) for img in subset]
+            image_list, _ = self.detector.transform(list(subset))
+            if self._detector_transform_is_identity(subset, image_list):
+                det_features = {'0': features[gated_idxs]}
+            else:
+                det_features = self.detector.backbone(image_list.tensors)
+
+            proposals, _ = self.detector.rpn(image_list, det_features)
+            detections, _ = self.detector.roi_heads(det_features, proposals, image_list.image_sizes)
+            detections = self.detector.transform.postprocess(detections, image_list.image_sizes, original_sizes)
+
+            for i, det in zip(gated_idxs, detections):
+                # Detector labels are 1-indexed (0 is background)
+                keep = class_gate[i][det['labels'] - 1]
+                det_output[i] = {k: v[keep] for k, v in det.items()}
+
+        return cls_output, det_output
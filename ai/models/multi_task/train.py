@@ -4,32 +4,68 @@ from torch.utils.tensorboard import SummaryWriter
 from src.models import MultiTaskModel
 from src.data_loader import get_dataloaders
 from src.utils import train_one_epoch, evaluate
+from src.checkpoint import CheckpointManager
+from src.augmentation import BatchAugmentation, BatchEvalTransform, IMAGENET_MEAN, IMAGENET_STD
+from src.distributed import (setup_distributed, cleanup_distributed, is_main_process, broadcast_resume_state,
+                             wrap_model_for_ddp, train_one_epoch_ddp, evaluate_ddp)
 
 def main(args):
-    device = torch.device("cuda" if torch.cuda.is_available() and args.use_cuda else "cpu")
-    writer = SummaryWriter(log_dir=args.log_dir)
-
-    # train_loader, val_loader, classes = get_dataloaders(args.data_path, args.batch_size)
-    # model = MultiTaskModel().to(device)
-    # optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
-    # cls_criterion = torch.nn.BCEWithLogitsLoss()
-    # lr_scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, 'min')
-    
-    # Exit if placeholders are not replaced
-    if model is None: return
+    if args.distributed:
+        # Launched via torchrun; gloo keeps this usable on CPU-only clusters
+        rank, world_size = setup_distributed(backend='gloo')
+        device = torch.device("cpu")
+        print(f"Rank {rank}/{world_size} initialised")
+    else:
+        device = torch.device("cuda" if torch.cuda.is_available() and args.use_cuda else "cpu")
+    writer = SummaryWriter(log_dir=args.log_dir) if is_main_process() else None
+
+    train_loader, val_loader, classes = get_dataloaders(
+        args.data_path, args.batch_size, num_workers=args.num_workers, distributed=args.distributed,
+        uint8_images=args.batch_augment
+    )
+    # uint8 batches are cropped, resized and normalised on-device, so validation needs the matching step
+    batch_transform = BatchAugmentation(mean=IMAGENET_MEAN, std=IMAGENET_STD) if args.batch_augment else None
+    val_batch_transform = BatchEvalTransform(mean=IMAGENET_MEAN, std=IMAGENET_STD) if args.batch_augment else None
+    model = MultiTaskModel(num_classes=len(classes)).to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+    cls_criterion = torch.nn.BCEWithLogitsLoss()
+    lr_scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, 'min')
+
+    # Only rank 0 reads and writes checkpoints. Without --resume, any checkpoints left in
+    # --checkpoint_dir by an earlier run are cleared
+    checkpoints, start_epoch = None, 0
+    if is_main_process():
+        checkpoints = CheckpointManager(args.checkpoint_dir, keep_last=args.keep_last, mode='min', resume=args.resume)
+        start_epoch = checkpoints.restore(model, optimizer, lr_scheduler) if args.resume else 0
+    if args.distributed:
+        # The directory need not be shared: every rank takes rank 0's epoch, optimizer and scheduler state,
+        # and wrapping after restoring makes DDP broadcast the resumed weights
+        start_epoch = broadcast_resume_state(start_epoch, optimizer, lr_scheduler)
+        ddp_step = wrap_model_for_ddp(model, cls_criterion)
 
     # --- Training Loop ---
-    best_val_loss = float('inf')
     history = {k: [] for k in ['train_loss', 'val_loss', 'val_auc', 'val_ap_cls', 'val_ap_det']}
 
-    for epoch in range(args.epochs):
-        print(f"\nEpoch {epoch + 1}/{args.epochs}")
+    for epoch in range(start_epoch, args.epochs):
+        if is_main_process():
+            print(f"\nEpoch {epoch + 1}/{args.epochs}")
         
-        train_losses = train_one_epoch(model, cls_criterion, train_loader, optimizer, device)
-        val_metrics = evaluate(model, cls_criterion, val_loader, device, classes)
+        if args.distributed:
+            train_loader.sampler.set_epoch(epoch)
+            train_losses = train_one_epoch_ddp(ddp_step, train_loader, optimizer, device, batch_transform)
+            val_metrics = evaluate_ddp(model, cls_criterion, val_loader, device, classes,
+                                       batch_transform=val_batch_transform)
+        else:
+            train_losses = train_one_epoch(model, cls_criterion, train_loader, optimizer, device, batch_transform)
+            val_metrics = evaluate(model, cls_criterion, val_loader, device, classes,
+                                   batch_transform=val_batch_transform)
 
+        # Validation metrics are aggregated across ranks, so every rank steps the scheduler identically
         lr_scheduler.step(val_metrics['classification_loss'])
-        
+
+        if not is_main_process():
+            continue
+
         # Logging to console
         print(f"Train Loss: {train_losses['total_loss']:.4f} | Val Loss: {val_metrics['classification_loss']:.4f} | "
               f"Val AUC: {val_metrics['mean_auc']:.4f} | Val mAP (Cls): {val_metrics['mean_ap_cls']:.4f} | "
@@ -41,14 +77,17 @@ def main(args):
         writer.add_scalar('Val/Mean_AP_Classification', val_metrics['mean_ap_cls'], epoch)
         writer.add_scalar('Val/Mean_AP_Detection', val_metrics['mean_ap_det'], epoch)
         
-        # Save best model
-        if val_metrics['classification_loss'] < best_val_loss:
-            best_val_loss = val_metrics['classification_loss']
-            torch.save(model.state_dict(), args.save_path)
-            print(f"Saved new best model to {args.save_path}")
+        # Snapshot full training state; serialisation happens on a background thread
+        if checkpoints.save(epoch, model, optimizer, lr_scheduler, val_metrics['classification_loss'],
+                            best_model_path=args.save_path):
+            print(f"Saving new best model to {args.save_path}")
     
-    writer.close()
-    print("--- Training complete ---")
+    if writer is not None:
+        checkpoints.wait()
+        writer.close()
+        print("--- Training complete ---")
+    if args.distributed:
+        cleanup_distributed()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Train Multi-Task Chest X-ray Model")
@@ -59,5 +98,13 @@ if __name__ == '__main__':
     parser.add_argument('--log_dir', type=str, default='runs/experiment1', help='TensorBoard log directory')
     parser.add_argument('--save_path', type=str, default='best_model.pth', help='Path to save the best model')
     parser.add_argument('--use_cuda', action='store_true', help='Use CUDA if available')
+    parser.add_argument('--checkpoint_dir', type=str, default='checkpoints', help='Directory for resumable checkpoints')
+    parser.add_argument('--keep_last', type=int, default=3, help='Number of recent epoch checkpoints to keep')
+    parser.add_argument('--resume', action='store_true', help='Resume from the latest checkpoint in --checkpoint_dir')
+    parser.add_argument('--batch_augment', action='store_true',
+                        help='Load uint8 images and augment whole batches after collation instead of in workers')
+    parser.add_argument('--num_workers', type=int, default=4, help='DataLoader workers per process')
+    parser.add_argument('--distributed', action='store_true',
+                        help='Distributed data-parallel training (gloo); launch with torchrun --nproc_per_node=N')
     args = parser.parse_args()
     main(args)
\ No newline at end of file
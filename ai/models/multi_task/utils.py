@@ -2,14 +2,21 @@ import torch
 import numpy as np
 from tqdm import tqdm
 from src.metrics import calculate_classification_metrics, calculate_detection_map
+from src.augmentation import images_to_float
 
-def train_one_epoch(model, cls_criterion, data_loader, optimizer, device):
-    """Runs a single epoch of training."""
+def train_one_epoch(model, cls_criterion, data_loader, optimizer, device, batch_transform=None):
+    """
+    Runs a single epoch of training. `batch_transform(images, det_targets)` (e.g. a
+    BatchAugmentation) is applied to each collated batch on `device`.
+    """
     model.train()
     total_losses, cls_losses, rpn_losses, roi_losses = [], [], [], []
 
     for images, cls_targets, det_targets in tqdm(data_loader, desc="Training"):
         images = images.to(device)
+        if batch_transform is not None:
+            images, det_targets = batch_transform(images, det_targets)
+        images = images_to_float(images)
         cls_targets = cls_targets.to(device)
         
         valid_det_targets = []
@@ -21,7 +28,8 @@ def train_one_epoch(model, cls_criterion, data_loader, optimizer, device):
         if valid_det_idxs:
             valid_images = images[valid_det_idxs]
             valid_cls_targets = cls_targets[valid_det_idxs]
-            valid_det_targets = [{k: v.to(device) for k, v in det_targets[i].items()} for i in valid_det_idxs]
+            valid_det_targets = [{k: v.to(device) if isinstance(v, torch.Tensor) else v for k, v in det_targets[i].items()}
+                                 for i in valid_det_idxs]
 
             cls_output, det_losses = model(valid_images, valid_det_targets, mode='both')
             cls_loss = cls_criterion(cls_output, valid_cls_targets)
@@ -59,8 +67,12 @@ def train_one_epoch(model, cls_criterion, data_loader, optimizer, device):
     }
 
 
-def evaluate(model, cls_criterion, data_loader, device, classes):
-    """Runs a single validation pass."""
+def evaluate(model, cls_criterion, data_loader, device, classes, cascade_thresholds=None, batch_transform=None):
+    """
+    Runs a single validation pass. With `cascade_thresholds` (one per class) the detector
+    only runs on images the classifier flags; see `MultiTaskModel.cascade_forward`.
+    `batch_transform` (e.g. a BatchEvalTransform) is applied to each collated batch on `device`.
+    """
     model.eval()
     cls_losses, all_cls_targets, all_cls_preds = [], [], []
     all_det_targets, all_det_preds = [], []
@@ -68,9 +80,15 @@ def evaluate(model, cls_criterion, data_loader, device, classes):
     with torch.no_grad():
         for images, cls_targets, det_targets in tqdm(data_loader, desc="Validating"):
             images = images.to(device)
+            if batch_transform is not None:
+                images, det_targets = batch_transform(images, det_targets)
+            images = images_to_float(images)
             cls_targets = cls_targets.to(device)
 
-            cls_output, det_output = model(images, mode='both')
+            if cascade_thresholds is not None:
+                cls_output, det_output = model.cascade_forward(images, cascade_thresholds)
+            else:
+                cls_output, det_output = model(images, mode='both')
             
             cls_losses.append(cls_criterion(cls_output, cls_targets).item())
             all_cls_targets.append(cls_targets.cpu().numpy())
@@ -0,0 +1,80 @@
+import pickle
+import tensorflow as tf
+# Framework-agnostic core shared with the PyTorch stack (plain os/threading, no torch import)
+from src.multi_task.checkpointing import AsyncCheckpointManager
+
+def _variable_key(variable):
+    return getattr(variable, 'path', None) or variable.name
+
+
+def _optimizer_variables(optimizer):
+    variables = optimizer.variables
+    return variables() if callable(variables) else variables  # Legacy optimizers expose a method
+
+
+class CheckpointManager(AsyncCheckpointManager):
+    """Checkpoints Keras model weights, optimizer slots and training stage."""
+    EXTENSION = 'pkl'
+
+    def __init__(self, checkpoint_dir, keep_last=3, monitor='val_loss', mode='min', resume=False):
+        super().__init__(checkpoint_dir, keep_last=keep_last, mode=mode, resume=resume)
+        self.monitor = monitor
+
+    def _dump(self, obj, path):
+        with open(path, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _load(self, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, model, epoch, stage, metric, stage_start=0):
+        is_best = self._update_best(metric)
+        # Weights are keyed by variable path because `model.weights` reorders when trainability changes
+        state = {
+            'epoch': epoch,
+            'stage': stage,
+            'stage_start': stage_start,
+            'weights': {_variable_key(v): v.numpy() for v in model.weights},
+            'optimizer': [v.numpy() for v in _optimizer_variables(model.optimizer)],
+            'metric': metric,
+            'best_metric': self.best_metric
+        }
+        self._submit(state, epoch, is_best)
+        return is_best
+
+    @staticmethod
+    def restore_weights(model, state):
+        for v in model.weights:
+            v.assign(state['weights'][_variable_key(v)])
+
+    @staticmethod
+    def restore_optimizer(model, state):
+        """Restores optimizer slots; the model must be compiled exactly as when the state was saved."""
+        optimizer = model.optimizer
+        if hasattr(optimizer, 'build'):
+            optimizer.build(model.trainable_variables)
+        else:
+            optimizer._create_all_weights(model.trainable_variables)
+        for v, value in zip(_optimizer_variables(optimizer), state['optimizer']):
+            v.assign(value)
+
+    def callback(self, stage, stage_start=0):
+        return AsyncCheckpoint(self, stage, stage_start)
+
+
+class AsyncCheckpoint(tf.keras.callbacks.Callback):
+    """Keras callback that hands each epoch's state to a CheckpointManager."""
+    def __init__(self, manager, stage, stage_start=0):
+        super().__init__()
+        self.manager = manager
+        self.stage = stage
+        self.stage_start = stage_start
+
+    def on_epoch_end(self, epoch, logs=None):
+        metric = (logs or {}).get(self.manager.monitor)
+        if metric is not None:
+            self.manager.save(self.model, epoch, self.stage, float(metric), stage_start=self.stage_start)
+
+    def on_train_end(self, logs=None):
+        self.manager.wait()
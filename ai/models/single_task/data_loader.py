@@ -3,10 +3,19 @@ import pandas as pd
 
 AUTOTUNE = tf.data.AUTOTUNE
 
+def _load_slice(image_list_file, all_xray_df):
+    df = pd.read_csv(image_list_file, header=None, names=['Image Index'])
+    return df.merge(all_xray_df, on='Image Index')
+
+
+def get_slice_size(image_list_file, all_xray_df):
+    """Number of examples `get_dataset_slice` yields for this image list, without decoding any images."""
+    return len(_load_slice(image_list_file, all_xray_df))
+
+
 def get_dataset_slice(image_list_file, all_xray_df, image_dir, batch_size=32, image_size=(224, 224)):
     """Creates a tf.data.Dataset for a given slice of the data (train, val, or test)."""
-    df = pd.read_csv(image_list_file, header=None, names=['Image Index'])
-    df = df.merge(all_xray_df, on='Image Index')
+    df = _load_slice(image_list_file, all_xray_df)
 
     image_paths = image_dir + '/' + df['Image Index']
     labels = tf.constant(df.iloc[:, 2:].values, dtype=tf.float32)
@@ -24,4 +33,4 @@ def get_dataset_slice(image_list_file, all_xray_df, image_dir, batch_size=32, im
     dataset = dataset.batch(batch_size)
     dataset = dataset.prefetch(buffer_size=AUTOTUNE)
 
-    return dataset
\ No newline at end of file
+    return dataset
@@ -0,0 +1,125 @@
+import os
+import numpy as np
+import tensorflow as tf
+from src.single_task.single_task_model import build_model
+from src.single_task.engine import train_model_sequentially
+from src.single_task.export import auc_latency_report
+
+def teacher_cache_path(cache_dir, teacher_name, split):
+    return os.path.join(cache_dir, f'teacher_{teacher_name}_{split}.npy')
+
+
+def precompute_teacher_outputs(teacher, dataset, output_path, num_samples=None):
+    """
+    Runs the teacher once over `dataset` and stores its sigmoid outputs as float16.
+    The dataset must be unshuffled (as returned by get_dataset_slice) so rows line up.
+    If `num_samples` is given (e.g. from `get_slice_size`), a cached file is only reused
+    when its row count matches it.
+    """
+    if os.path.exists(output_path):
+        soft_targets = np.load(output_path, mmap_mode='r')
+        if num_samples is not None and len(soft_targets) != num_samples:
+            raise ValueError(f"Cached teacher outputs in {output_path} have {len(soft_targets)} rows but the "
+                             f"dataset has {num_samples} samples; delete the file to recompute it")
+        print(f"Using cached teacher outputs from {output_path}")
+        return soft_targets
+
+    soft_targets = teacher.predict(dataset.map(lambda images, labels: images))
+    np.save(output_path, soft_targets.astype(np.float16))
+    print(f"Saved teacher outputs for {len(soft_targets)} images to {output_path}")
+    return np.load(output_path, mmap_mode='r')
+
+
+def get_distillation_dataset(dataset, soft_targets, batch_size=32):
+    """
+    Pairs each (image, labels) example with its teacher output. Targets are concatenated
+    as [hard labels | soft labels] so the standard `model.fit` path can be reused.
+    """
+    soft_dataset = tf.data.Dataset.from_tensor_slices(np.asarray(soft_targets, dtype=np.float32))
+    dataset = tf.data.Dataset.zip((dataset.unbatch(), soft_dataset))
+    dataset = dataset.map(
+        lambda example, soft: (example[0], tf.concat([example[1], soft], axis=-1)),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.prefetch(buffer_size=tf.data.AUTOTUNE)
+    return dataset
+
+
+def get_distillation_loss(num_classes=14, alpha=0.5, temperature=2.0):
+    """
+    Weighted sum of BCE against the hard labels and BCE against the teacher's
+    temperature-softened sigmoid outputs (scaled by T^2 to keep gradient magnitudes comparable).
+    """
+    def loss_fn(y_true, y_pred):
+        y_true = tf.cast(y_true, tf.float32)
+        hard_targets, soft_targets = y_true[:, :num_classes], y_true[:, num_classes:]
+
+        epsilon = tf.keras.backend.epsilon()
+        y_pred = tf.clip_by_value(y_pred, epsilon, 1.0 - epsilon)
+        soft_targets = tf.clip_by_value(soft_targets, epsilon, 1.0 - epsilon)
+        student_logits = tf.math.log(y_pred / (1.0 - y_pred))
+        teacher_logits = tf.math.log(soft_targets / (1.0 - soft_targets))
+
+        hard_loss = tf.nn.sigmoid_cross_entropy_with_logits(labels=hard_targets, logits=student_logits)
+        soft_loss = tf.nn.sigmoid_cross_entropy_with_logits(
+            labels=tf.sigmoid(teacher_logits / temperature),
+            logits=student_logits / temperature
+        )
+        return tf.reduce_mean(alpha * hard_loss + (1.0 - alpha) * (temperature ** 2) * soft_loss)
+
+    return loss_fn
+
+
+class DistillationAUC(tf.keras.metrics.AUC):
+    """Multi-label AUC computed on the hard-label half of the concatenated distillation targets."""
+    def __init__(self, num_classes=14, name='auc', **kwargs):
+        super().__init__(multi_label=True, name=name, **kwargs)
+        self.num_classes = num_classes
+
+    def update_state(self, y_true, y_pred, sample_weight=None):
+        return super().update_state(y_true[:, :self.num_classes], y_pred, sample_weight=sample_weight)
+
+
+def train_student_with_distillation(teacher, train_dataset, val_dataset, student_backbone='MobileNetV2',
+                                    cache_dir='distillation_cache', batch_size=32, num_classes=14,
+                                    alpha=0.5, temperature=2.0, epochs_head=10, epochs_fine_tune=20,
+                                    checkpoint_path=None, teacher_name=None, num_samples=None):
+    """
+    Distils `teacher` (e.g. the fine-tuned DenseNet121) into a small backbone from BACKBONES,
+    using the same two-stage schedule as `train_model_sequentially`.
+    Teacher outputs are cached per `teacher_name` (defaults to `teacher.name`) and split,
+    so pass a stable, distinct name for each teacher sharing a `cache_dir`. `num_samples`
+    optionally maps 'train'/'val' to the expected sample counts used to validate that cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    teacher_name = teacher_name or teacher.name
+    num_samples = num_samples or {}
+    train_soft = precompute_teacher_outputs(teacher, train_dataset, teacher_cache_path(cache_dir, teacher_name, 'train'),
+                                            num_samples=num_samples.get('train'))
+    val_soft = precompute_teacher_outputs(teacher, val_dataset, teacher_cache_path(cache_dir, teacher_name, 'val'),
+                                          num_samples=num_samples.get('val'))
+
+    distill_train = get_distillation_dataset(train_dataset, train_soft, batch_size)
+    distill_val = get_distillation_dataset(val_dataset, val_soft, batch_size)
+
+    loss = get_distillation_loss(num_classes, alpha=alpha, temperature=temperature)
+    student = build_model(student_backbone, num_classes=num_classes)
+    student.compile(
+        optimizer=tf.keras.optimizers.Adam(),
+        loss=loss,
+        metrics=[DistillationAUC(num_classes)]
+    )
+
+    checkpoint_path = checkpoint_path or f'best_student_{student_backbone}.h5'
+    return train_model_sequentially(
+        student, distill_train, distill_val,
+        epochs_head=epochs_head, epochs_fine_tune=epochs_fine_tune, checkpoint_path=checkpoint_path,
+        loss=loss, metrics=[DistillationAUC(num_classes)]
+    )
+
+
+def distillation_report(teacher, students, test_dataset, output_dir='distillation_report'):
+    """Reports AUC vs. TFLite latency for the teacher and each student (name -> model)."""
+    models = {'teacher': teacher, **students}
+    return auc_latency_report(models, test_dataset, output_dir, reference='teacher')
@@ -1,34 +1,74 @@
+import os
 import tensorflow as tf
 from src.single_task.single_task_model import unfreeze_top_layers
+from src.single_task.checkpoint import CheckpointManager
+
+def train_model_sequentially(model, train_dataset, val_dataset, epochs_head=10, epochs_fine_tune=20, checkpoint_path='best_model.h5',
+                             loss=None, metrics=None, checkpoint_dir=None, keep_last=3, resume=False):
+    """
+    Two-stage training (head, then top-layer fine-tuning). Per-epoch state is checkpointed
+    asynchronously to `checkpoint_dir`; with `resume=True` training continues from the
+    latest checkpoint in either stage. The best model is saved to `checkpoint_path` at the end.
+    """
+    checkpoint_dir = checkpoint_dir or f"{os.path.splitext(checkpoint_path)[0]}_checkpoints"
+    # Without `resume`, checkpoints left in `checkpoint_dir` by an earlier run are cleared
+    checkpoints = CheckpointManager(checkpoint_dir, keep_last=keep_last, monitor='val_loss', mode='min', resume=resume)
+    state = checkpoints.load() if resume else None
+    if state is not None:
+        print(f"Resuming from stage {state['stage']}, epoch {state['epoch'] + 1}")
 
-def train_model_sequentially(model, train_dataset, val_dataset, epochs_head=10, epochs_fine_tune=20, checkpoint_path='best_model.h5'):
     early_stopping = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
-    model_checkpoint = tf.keras.callbacks.ModelCheckpoint(checkpoint_path, save_best_only=True, monitor='val_loss')
+    history_head = history_fine_tune = None
 
-    print("\n--- STAGE 1: Training classification head ---")
-    history_head = model.fit(
-        train_dataset,
-        validation_data=val_dataset,
-        epochs=epochs_head,
-        callbacks=[early_stopping, model_checkpoint]
-    )
+    if state is None or state['stage'] == 1:
+        print("\n--- STAGE 1: Training classification head ---")
+        initial_epoch = 0
+        if state is not None:
+            checkpoints.restore_weights(model, state)
+            checkpoints.restore_optimizer(model, state)
+            initial_epoch = state['epoch'] + 1
+        history_head = model.fit(
+            train_dataset,
+            validation_data=val_dataset,
+            epochs=epochs_head,
+            initial_epoch=initial_epoch,
+            callbacks=[early_stopping, checkpoints.callback(stage=1)]
+        )
 
     print("\n--- STAGE 2: Fine-tuning top layers ---")
-    model = unfreeze_top_layers(model) # Assumes the function is imported or in this file
-    
-    initial_epoch = history_head.epoch[-1] + 1
+    model = unfreeze_top_layers(model, loss=loss, metrics=metrics) # Keeps a custom loss (e.g. distillation) across recompiles
+
+    if state is not None and state['stage'] == 2:
+        checkpoints.restore_weights(model, state)
+        checkpoints.restore_optimizer(model, state)
+        fine_tune_start = state['stage_start']
+        initial_epoch = state['epoch'] + 1
+    else:
+        if history_head is not None and history_head.epoch:
+            fine_tune_start = history_head.epoch[-1] + 1
+        elif state is not None:  # Stage 1 had already finished before resuming
+            fine_tune_start = state['epoch'] + 1
+        else:  # No head epochs were run (e.g. the head was trained from cached features)
+            fine_tune_start = 0
+        initial_epoch = fine_tune_start
+
     history_fine_tune = model.fit(
         train_dataset,
         validation_data=val_dataset,
-        epochs=initial_epoch + epochs_fine_tune,
+        epochs=fine_tune_start + epochs_fine_tune,
         initial_epoch=initial_epoch,
-        callbacks=[early_stopping, model_checkpoint]
+        callbacks=[early_stopping, checkpoints.callback(stage=2, stage_start=fine_tune_start)]
     )
     
     history = {}
-    for key in history_head.history.keys():
-        history[key] = history_head.history[key] + history_fine_tune.history[key]
+    for key in history_fine_tune.history.keys():
+        head = history_head.history.get(key, []) if history_head is not None else []
+        history[key] = head + history_fine_tune.history[key]
 
-    model.load_weights(checkpoint_path)
+    checkpoints.wait()
+    best_state = checkpoints.load_best()
+    if best_state is not None:
+        checkpoints.restore_weights(model, best_state)
+    model.save(checkpoint_path)
     
-    return model, history
\ No newline at end of file
+    return model, history
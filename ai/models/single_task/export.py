@@ -0,0 +1,83 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+def convert_to_tflite(model, output_path, optimize=True):
+    """Converts a Keras model to TFLite the same way app/converter/main.py does."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if optimize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    tflite_model = converter.convert()
+
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    return output_path
+
+
+def evaluate_keras_model(model, dataset):
+    """Computes the multi-label AUC of a Keras model on a (images, labels) dataset."""
+    auc = tf.keras.metrics.AUC(multi_label=True, name='auc')
+    for images, labels in dataset:
+        auc.update_state(labels, model(images, training=False))
+    return float(auc.result())
+
+
+def evaluate_tflite_model(tflite_path, dataset, num_threads=None, warmup=5):
+    """
+    Runs a TFLite model image by image over `dataset`, returning its multi-label AUC
+    and the mean single-image latency in milliseconds.
+    """
+    interpreter = tf.lite.Interpreter(model_path=tflite_path, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+
+    auc = tf.keras.metrics.AUC(multi_label=True, name='auc')
+    latencies = []
+    for images, labels in dataset:
+        preds = []
+        for image in images.numpy():
+            interpreter.set_tensor(input_index, image[np.newaxis].astype(np.float32))
+            start = time.perf_counter()
+            interpreter.invoke()
+            latencies.append(time.perf_counter() - start)
+            preds.append(interpreter.get_tensor(output_index)[0])
+        auc.update_state(labels, np.stack(preds))
+
+    latencies = latencies[warmup:] if len(latencies) > warmup else latencies
+    return {'auc': float(auc.result()), 'latency_ms': 1000 * float(np.mean(latencies))}
+
+
+def auc_latency_report(models, test_dataset, output_dir, optimize=True, reference=None):
+    """
+    Exports each model in `models` (name -> Keras model) through the TFLite converter
+    and reports Keras AUC, TFLite AUC (parity), model size and per-image latency.
+    `reference` names the model the others are compared against (e.g. the teacher).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rows = []
+    for name, model in models.items():
+        tflite_path = convert_to_tflite(model, os.path.join(output_dir, f"{name}.tflite"), optimize=optimize)
+        tflite_metrics = evaluate_tflite_model(tflite_path, test_dataset)
+        keras_auc = evaluate_keras_model(model, test_dataset)
+        rows.append({
+            'model': name,
+            'params': model.count_params(),
+            'keras_auc': keras_auc,
+            'tflite_auc': tflite_metrics['auc'],
+            'auc_parity_delta': tflite_metrics['auc'] - keras_auc,
+            'tflite_size_mb': os.path.getsize(tflite_path) / (1024 * 1024),
+            'latency_ms': tflite_metrics['latency_ms']
+        })
+        print(f"{name}: AUC {keras_auc:.4f} (TFLite {tflite_metrics['auc']:.4f}), "
+              f"{tflite_metrics['latency_ms']:.2f} ms/image")
+
+    report = pd.DataFrame(rows).set_index('model')
+    if reference is not None and reference in report.index:
+        report['auc_vs_reference'] = report['keras_auc'] - report.loc[reference, 'keras_auc']
+        report['speedup_vs_reference'] = report.loc[reference, 'latency_ms'] / report['latency_ms']
+
+    report.to_csv(os.path.join(output_dir, 'auc_latency_report.csv'))
+    return report
@@ -0,0 +1,179 @@
+import os
+import json
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from src.single_task.single_task_model import BACKBONES
+
+def _cache_paths(cache_dir, backbone_name, split):
+    prefix = os.path.join(cache_dir, backbone_name, split)
+    return f"{prefix}_features.f16", f"{prefix}_labels.f16", f"{prefix}_meta.json"
+
+
+def _check_sample_count(description, cached, expected):
+    if expected is not None and cached != expected:
+        raise ValueError(f"{description} has {cached} samples but {expected} were expected")
+
+
+def build_feature_cache(backbone_name, dataset, cache_dir, split, input_shape=(224, 224, 3), num_samples=None):
+    """
+    Runs the frozen ImageNet backbone once over `dataset` and stores the globally pooled
+    embeddings as raw float16 (memory-mappable), alongside the labels. Embeddings match the
+    GlobalAveragePooling2D output that `build_model` feeds into its Dense head.
+
+    An existing cache is reused only if its input shape and, when `num_samples` is given
+    (e.g. from `get_slice_size`), its sample count match; the dataset is never iterated to check.
+    """
+    features_path, labels_path, meta_path = _cache_paths(cache_dir, backbone_name, split)
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if tuple(meta.get('input_shape', ())) != tuple(input_shape):
+            raise ValueError(f"Feature cache for {backbone_name}/{split} was built for input shape "
+                             f"{meta.get('input_shape')}, not {list(input_shape)}; "
+                             f"delete {os.path.dirname(meta_path)} to rebuild it")
+        _check_sample_count(f"Feature cache for {backbone_name}/{split}", meta['num_samples'], num_samples)
+        print(f"Feature cache for {backbone_name}/{split} already exists, skipping")
+        return meta_path
+
+    os.makedirs(os.path.dirname(features_path), exist_ok=True)
+    base_model = BACKBONES[backbone_name](include_top=False, weights='imagenet', input_shape=input_shape, pooling='avg')
+    base_model.trainable = False
+
+    # Sizes are unknown up front, so batches are appended sequentially and the shape goes in the metadata
+    written = feature_dim = num_classes = 0
+    with open(features_path, 'wb') as features_file, open(labels_path, 'wb') as labels_file:
+        for images, labels in dataset:
+            batch_features = base_model(images, training=False).numpy()
+            features_file.write(batch_features.astype(np.float16).tobytes())
+            labels_file.write(labels.numpy().astype(np.float16).tobytes())
+            written += len(batch_features)
+            feature_dim, num_classes = batch_features.shape[1], labels.shape[1]
+    _check_sample_count(f"Dataset for {backbone_name}/{split}", written, num_samples)
+
+    # The metadata file is written last and marks the cache as complete
+    with open(meta_path, 'w') as f:
+        json.dump({'backbone': backbone_name, 'input_shape': list(input_shape), 'num_samples': written,
+                   'feature_dim': int(feature_dim), 'num_classes': int(num_classes)}, f)
+    print(f"Cached {written} {backbone_name} embeddings ({feature_dim}-d) to {features_path}")
+    return meta_path
+
+
+def build_feature_caches(datasets, cache_dir, backbones=None, input_shape=(224, 224, 3), num_samples=None):
+    """
+    Builds the cache for every backbone (default: all of BACKBONES) and split in `datasets`
+    (split -> dataset). `num_samples` optionally maps each split to its expected sample count.
+    """
+    num_samples = num_samples or {}
+    for backbone_name in backbones or BACKBONES:
+        for split, dataset in datasets.items():
+            build_feature_cache(backbone_name, dataset, cache_dir, split, input_shape=input_shape,
+                                num_samples=num_samples.get(split))
+
+
+def load_feature_cache(cache_dir, backbone_name, split):
+    """Returns memory-mapped (features, labels) float16 arrays for a cached split."""
+    features_path, labels_path, meta_path = _cache_paths(cache_dir, backbone_name, split)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    features = np.memmap(features_path, dtype=np.float16, mode='r', shape=(meta['num_samples'], meta['feature_dim']))
+    labels = np.memmap(labels_path, dtype=np.float16, mode='r', shape=(meta['num_samples'], meta['num_classes']))
+    return features, labels
+
+
+def get_cached_dataset(features, labels, batch_size=256, shuffle=False, seed=None):
+    """Streams batches straight from the memory-mapped arrays as float32."""
+    num_samples = len(features)
+    rng = np.random.default_rng(seed)
+
+    def generator():
+        order = rng.permutation(num_samples) if shuffle else np.arange(num_samples)
+        for start in range(0, num_samples, batch_size):
+            idx = np.sort(order[start:start + batch_size])  # Sorted indices keep memmap reads sequential
+            yield features[idx].astype(np.float32), labels[idx].astype(np.float32)
+
+    dataset = tf.data.Dataset.from_generator(generator, output_signature=(
+        tf.TensorSpec(shape=(None, features.shape[1]), dtype=tf.float32),
+        tf.TensorSpec(shape=(None, labels.shape[1]), dtype=tf.float32)
+    ))
+    return dataset.prefetch(buffer_size=tf.data.AUTOTUNE)
+
+
+def build_head(feature_dim, num_classes=14, learning_rate=1e-3, dropout=0.0):
+    """The Dense classification head of `build_model`, taking pooled embeddings as input."""
+    inputs = tf.keras.Input(shape=(feature_dim,))
+    x = tf.keras.layers.Dropout(dropout)(inputs) if dropout > 0 else inputs
+    outputs = tf.keras.layers.Dense(num_classes, activation='sigmoid')(x)
+    head = tf.keras.Model(inputs, outputs)
+
+    head.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss=tf.keras.losses.BinaryCrossentropy(),
+        metrics=[tf.keras.metrics.AUC(multi_label=True, name='auc')]
+    )
+    return head
+
+
+def train_head_from_cache(cache_dir, backbone_name, learning_rate=1e-3, batch_size=256, epochs=20, dropout=0.0, seed=42):
+    """Trains the Dense head on cached train embeddings, validating on cached val embeddings."""
+    tf.keras.utils.set_random_seed(seed)
+    train_features, train_labels = load_feature_cache(cache_dir, backbone_name, 'train')
+    val_features, val_labels = load_feature_cache(cache_dir, backbone_name, 'val')
+
+    head = build_head(train_features.shape[1], train_labels.shape[1], learning_rate=learning_rate, dropout=dropout)
+    history = head.fit(
+        get_cached_dataset(train_features, train_labels, batch_size, shuffle=True, seed=seed),
+        validation_data=get_cached_dataset(val_features, val_labels, batch_size),
+        epochs=epochs,
+        callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)],
+        verbose=0
+    )
+    return head, history.history
+
+
+def transfer_head_weights(head, model):
+    """
+    Copies a cache-trained head into a `build_model` model, so `train_model_sequentially`
+    can skip stage 1 (epochs_head=0) and go straight to fine-tuning.
+    """
+    model.layers[-1].set_weights(head.layers[-1].get_weights())
+    return model
+
+
+def _summarize_sweep_run(config, history):
+    best_epoch = int(np.argmin(history['val_loss']))
+    return {**config, 'val_loss': history['val_loss'][best_epoch],
+            'val_auc': history['val_auc'][best_epoch], 'best_epoch': best_epoch + 1}
+
+
+def _run_sweep_config(cache_dir, config):
+    hyperparams = {k: v for k, v in config.items() if k != 'backbone'}
+    _, history = train_head_from_cache(cache_dir, config['backbone'], **hyperparams)
+    return _summarize_sweep_run(config, history)
+
+
+def _run_sweep_config_in_process(args):
+    cache_dir, config, threads = args
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    return _run_sweep_config(cache_dir, config)
+
+
+def run_head_sweep(cache_dir, configs, num_processes=1):
+    """
+    Trains one head per config (a dict with 'backbone' plus any `train_head_from_cache`
+    keyword arguments) from the cache, optionally across parallel processes.
+    Returns a DataFrame sorted by validation AUC.
+    """
+    if num_processes > 1:
+        threads = max(1, (os.cpu_count() or 1) // num_processes)
+        ctx = mp.get_context('spawn')  # Each process gets a fresh TensorFlow runtime
+        with ctx.Pool(num_processes) as pool:
+            results = pool.map(_run_sweep_config_in_process, [(cache_dir, c, threads) for c in configs])
+    else:
+        results = [_run_sweep_config(cache_dir, c) for c in configs]
+
+    report = pd.DataFrame(results).sort_values('val_auc', ascending=False).reset_index(drop=True)
+    print(report.to_string())
+    return report
@@ -0,0 +1,212 @@
+import os
+import time
+import numpy as np
+import tensorflow as tf
+from src.single_task.single_task_model import unfreeze_top_layers
+from src.single_task.export import auc_latency_report
+
+def find_prunable_blocks(base_model):
+    """
+    Finds bottleneck blocks whose `<block>_1_conv` output is consumed only by
+    `<block>_1_bn` and `<block>_2_conv` (DenseNet121 and ResNet50 naming). Removing
+    channels there shrinks both convolutions without touching any concatenation.
+    """
+    names = {layer.name for layer in base_model.layers}
+    blocks = []
+    for layer in base_model.layers:
+        if isinstance(layer, tf.keras.layers.Conv2D) and layer.name.endswith('_1_conv'):
+            prefix = layer.name[:-len('_1_conv')]
+            if f'{prefix}_1_bn' in names and f'{prefix}_2_conv' in names:
+                blocks.append(prefix)
+    return blocks
+
+
+def channel_importance(base_model, prefix):
+    """Scores each bottleneck channel by |BN gamma| times the L1 norm of the weights that consume it."""
+    gamma = np.abs(base_model.get_layer(f'{prefix}_1_bn').gamma.numpy())
+    next_kernel = base_model.get_layer(f'{prefix}_2_conv').kernel.numpy()
+    return gamma * np.abs(next_kernel).sum(axis=(0, 1, 3))
+
+
+def _block_costs(base_model, blocks):
+    """MACs contributed by one channel of each bottleneck (through both convolutions)."""
+    costs = {}
+    for prefix in blocks:
+        conv1 = base_model.get_layer(f'{prefix}_1_conv')
+        conv2 = base_model.get_layer(f'{prefix}_2_conv')
+        _, h1, w1, _ = conv1.output.shape
+        _, h2, w2, out2 = conv2.output.shape
+        k1 = np.prod(conv1.kernel_size) * conv1.input.shape[-1]
+        k2 = np.prod(conv2.kernel_size) * out2
+        costs[prefix] = h1 * w1 * k1 + h2 * w2 * k2
+    return costs
+
+
+def count_flops(model):
+    """Counts multiply-accumulates of all Conv2D and Dense layers, descending into nested models."""
+    total = 0
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.Model):
+            total += count_flops(layer)
+        elif isinstance(layer, tf.keras.layers.DepthwiseConv2D):
+            _, h, w, c = layer.output.shape
+            total += h * w * c * np.prod(layer.kernel_size)
+        elif isinstance(layer, tf.keras.layers.Conv2D):
+            _, h, w, c = layer.output.shape
+            total += h * w * c * np.prod(layer.kernel_size) * layer.input.shape[-1]
+        elif isinstance(layer, tf.keras.layers.Dense):
+            total += layer.input.shape[-1] * layer.units
+    return int(total)
+
+
+def plan_pruning(base_model, target_flops, min_channels=8):
+    """
+    Chooses how many channels to keep per block so the backbone fits `target_flops`,
+    pruning the same fraction from every block. Returns {prefix: kept channel indices}.
+    Raises ValueError if the backbone has no prunable blocks or the target is unreachable.
+    """
+    blocks = find_prunable_blocks(base_model)
+    if not blocks:
+        raise ValueError(f"No prunable bottleneck blocks found in '{base_model.name}'; "
+                         f"structured pruning supports DenseNet121 and ResNet50 naming")
+    costs = _block_costs(base_model, blocks)
+    widths = {p: base_model.get_layer(f'{p}_1_conv').filters for p in blocks}
+    base_flops = count_flops(base_model)
+
+    def keep_counts(ratio):
+        return {p: max(min_channels, int(round(widths[p] * (1.0 - ratio)))) for p in blocks}
+
+    def flops_for(ratio):
+        kept = keep_counts(ratio)
+        return base_flops - sum((widths[p] - kept[p]) * costs[p] for p in blocks)
+
+    low, high = 0.0, 1.0
+    for _ in range(30):
+        mid = (low + high) / 2
+        if flops_for(mid) > target_flops:
+            low = mid
+        else:
+            high = mid
+
+    if flops_for(high) > target_flops:
+        raise ValueError(f"Target of {target_flops / 1e9:.2f} GMACs is unreachable: pruning every block down to "
+                         f"{min_channels} channels still leaves {flops_for(high) / 1e9:.2f} GMACs")
+
+    plan = {}
+    for prefix, keep in keep_counts(high).items():
+        scores = channel_importance(base_model, prefix)
+        plan[prefix] = np.sort(np.argsort(scores)[::-1][:keep])
+    return plan
+
+
+def apply_pruning(model, plan):
+    """
+    Physically rebuilds the classifier with the planned channels removed and copies
+    the surviving weights, so the exported graph actually shrinks.
+    """
+    base_model = model.layers[1]
+    conv1_names = {f'{p}_1_conv': p for p in plan}
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        if layer.name in conv1_names:
+            config['filters'] = len(plan[conv1_names[layer.name]])
+        return layer.__class__.from_config(config)
+
+    pruned_base = tf.keras.models.clone_model(base_model, clone_function=clone_layer)
+
+    for layer in pruned_base.layers:
+        old_layer = base_model.get_layer(layer.name)
+        weights = old_layer.get_weights()
+        if layer.name.endswith('_1_conv') and layer.name[:-len('_1_conv')] in plan:
+            keep = plan[layer.name[:-len('_1_conv')]]
+            weights = [weights[0][..., keep]] + [w[keep] for w in weights[1:]]
+        elif layer.name.endswith('_1_bn') and layer.name[:-len('_1_bn')] in plan:
+            keep = plan[layer.name[:-len('_1_bn')]]
+            weights = [w[keep] for w in weights]
+        elif layer.name.endswith('_2_conv') and layer.name[:-len('_2_conv')] in plan:
+            keep = plan[layer.name[:-len('_2_conv')]]
+            weights = [weights[0][:, :, keep, :]] + weights[1:]
+        layer.set_weights(weights)
+
+    pruned_base.trainable = False
+    inputs = tf.keras.Input(shape=model.input_shape[1:])
+    x = pruned_base(inputs, training=False)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(model.output_shape[-1], activation='sigmoid')(x)
+    pruned_model = tf.keras.Model(inputs, outputs)
+    pruned_model.layers[-1].set_weights(model.layers[-1].get_weights())
+
+    pruned_model.compile(
+        optimizer=tf.keras.optimizers.Adam(),
+        loss=tf.keras.losses.BinaryCrossentropy(),
+        metrics=[tf.keras.metrics.AUC(multi_label=True, name='auc')]
+    )
+    return pruned_model
+
+
+def measure_latency(model, runs=20):
+    """Mean single-image Keras latency in milliseconds on a dummy input."""
+    dummy = np.zeros((1,) + tuple(model.input_shape[1:]), dtype=np.float32)
+    model.predict_on_batch(dummy)
+    start = time.perf_counter()
+    for _ in range(runs):
+        model.predict_on_batch(dummy)
+    return 1000 * (time.perf_counter() - start) / runs
+
+
+def prune_model(model, target_flops_ratio=0.5, target_latency_ms=None, max_iterations=5):
+    """
+    Prunes to a FLOPs budget (fraction of the original), or, if `target_latency_ms`
+    is given, repeatedly tightens the FLOPs budget until measured latency fits.
+    """
+    base_flops = count_flops(model.layers[1])
+    flops_ratio = target_flops_ratio
+    pruned = apply_pruning(model, plan_pruning(model.layers[1], base_flops * flops_ratio))
+
+    if target_latency_ms is not None:
+        for _ in range(max_iterations):
+            latency = measure_latency(pruned)
+            print(f"FLOPs ratio {flops_ratio:.2f}: {latency:.2f} ms/image (target {target_latency_ms:.2f})")
+            if latency <= target_latency_ms:
+                break
+            flops_ratio *= target_latency_ms / latency
+            pruned = apply_pruning(model, plan_pruning(model.layers[1], base_flops * flops_ratio))
+
+    print(f"Pruned backbone from {base_flops / 1e9:.2f} to {count_flops(pruned.layers[1]) / 1e9:.2f} GMACs, "
+          f"{model.count_params():,} -> {pruned.count_params():,} parameters.")
+    return pruned
+
+
+def prune_finetune_and_export(model, train_dataset, val_dataset, test_dataset, target_flops_ratio=0.5,
+                              target_latency_ms=None, epochs_fine_tune=10, num_layers_to_unfreeze=None,
+                              checkpoint_path='best_model_pruned.h5', output_dir='pruned_export'):
+    """
+    Prunes `model`, fine-tunes it via `unfreeze_top_layers`, saves a SavedModel for the
+    tensorflowjs converter and reports AUC parity and latency against the original.
+    """
+    pruned = prune_model(model, target_flops_ratio=target_flops_ratio, target_latency_ms=target_latency_ms)
+
+    if num_layers_to_unfreeze is None:
+        num_layers_to_unfreeze = len(pruned.layers[1].layers)  # Pruning touches the whole backbone
+    pruned = unfreeze_top_layers(pruned, num_layers_to_unfreeze=num_layers_to_unfreeze)
+
+    early_stopping = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    model_checkpoint = tf.keras.callbacks.ModelCheckpoint(checkpoint_path, save_best_only=True, monitor='val_loss')
+    pruned.fit(
+        train_dataset,
+        validation_data=val_dataset,
+        epochs=epochs_fine_tune,
+        callbacks=[early_stopping, model_checkpoint]
+    )
+    pruned.load_weights(checkpoint_path)
+
+    os.makedirs(output_dir, exist_ok=True)
+    saved_model_dir = os.path.join(output_dir, 'saved_model')
+    tf.saved_model.save(pruned, saved_model_dir)
+    print(f"Saved pruned SavedModel to {saved_model_dir}. Convert for the web app with:")
+    print(f"tensorflowjs_converter --input_format=tf_saved_model --output_format=tfjs_graph_model "
+          f"{saved_model_dir} {os.path.join(output_dir, 'web_model')}")
+
+    report = auc_latency_report({'original': model, 'pruned': pruned}, test_dataset, output_dir, reference='original')
+    return pruned, report
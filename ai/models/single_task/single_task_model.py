@@ -1,16 +1,16 @@
 import tensorflow as tf
 
+BACKBONES = {
+    'DenseNet121': tf.keras.applications.DenseNet121,
+    'EfficientNetB0': tf.keras.applications.EfficientNetB0,
+    'ResNet50': tf.keras.applications.ResNet50,
+    'MobileNetV2': tf.keras.applications.MobileNetV2
+}
+
 def build_model(backbone_name='MobileNetV2', input_shape=(224, 224, 3), num_classes=14):
     """
     Builds and compiles a Keras model using a specified pre-trained backbone.
     """
-    BACKBONES = {
-        'DenseNet121': tf.keras.applications.DenseNet121,
-        'EfficientNetB0': tf.keras.applications.EfficientNetB0,
-        'ResNet50': tf.keras.applications.ResNet50,
-        'MobileNetV2': tf.keras.applications.MobileNetV2
-    }
-
     if backbone_name not in BACKBONES:
         raise ValueError(f"Backbone '{backbone_name}' not supported. "
                          f"Choose from {list(BACKBONES.keys())}")
@@ -39,8 +39,11 @@ def build_model(backbone_name='MobileNetV2', input_shape=(224, 224, 3), num_clas
     return model
 
 
-def unfreeze_top_layers(model, num_layers_to_unfreeze=20):
-    """Unfreezes the top layers of the model's backbone for fine-tuning."""
+def unfreeze_top_layers(model, num_layers_to_unfreeze=20, loss=None, metrics=None):
+    """
+    Unfreezes the top layers of the model's backbone for fine-tuning.
+    `loss` and `metrics` override the default BCE/AUC compile settings (e.g. for distillation).
+    """
     base_model = model.layers[1] 
     base_model.trainable = True
     
@@ -49,8 +52,8 @@ def unfreeze_top_layers(model, num_layers_to_unfreeze=20):
         
     model.compile(
         optimizer=tf.keras.optimizers.Adam(learning_rate=1e-5),
-        loss=tf.keras.losses.BinaryCrossentropy(),
-        metrics=[tf.keras.metrics.AUC(multi_label=True, name='auc')]
+        loss=loss if loss is not None else tf.keras.losses.BinaryCrossentropy(),
+        metrics=metrics if metrics is not None else [tf.keras.metrics.AUC(multi_label=True, name='auc')]
     )
     print(f"Unfroze top {num_layers_to_unfreeze} layers for fine-tuning.")
     return model
\ No newline at end of file
@@ -3,6 +3,8 @@ import tensorflow as tf
 from tensorflow.keras.models import Model
 import numpy as np
 import cv2 # OpenCV for image processing
+import os
+from tracing import configure as configure_tracing, tracer
 
 # --- Configuration ---
 MODEL_PATH = 'best_model_finetuned.h5' # Make sure this path is correct
@@ -11,6 +13,9 @@ SELECTED_CONDITIONS = ['Pneumonia', 'Effusion', 'Cardiomegaly']
 # For DenseNet121, a common last convolutional block's concatenated output layer
 # If you used a different model or know the exact layer, you might need to change this.
 GRAD_CAM_TARGET_LAYER_NAME = 'conv5_block16_concat'
+# Prometheus metrics endpoint (set to 0 to disable) and optional Chrome-trace dump file
+METRICS_PORT = int(os.environ.get('XRAY_METRICS_PORT', 9100))
+TRACE_FILE = os.environ.get('XRAY_TRACE_FILE')
 
 # --- Load the Trained Model ---
 try:
@@ -88,21 +93,34 @@ def predict_and_visualize_xray(input_image_pil):
     Takes a PIL image from Gradio, preprocesses it, gets predictions,
     and generates Grad-CAM overlays.
     """
+    tracer.inc('requests')
+    try:
+        with tracer.span('request'):
+            return _predict_and_visualize_xray(input_image_pil)
+    except Exception:
+        tracer.inc('errors')
+        raise
+
+def _predict_and_visualize_xray(input_image_pil):
     if model is None:
+        tracer.inc('errors')
         return "Error: Model not loaded. Please check server logs.", None, None, None
 
     # Convert PIL Image to NumPy array (Gradio provides PIL by default for gr.Image)
     # Ensure it's RGB
-    input_image_np = np.array(input_image_pil.convert("RGB"))
+    with tracer.span('pil_to_numpy'):
+        input_image_np = np.array(input_image_pil.convert("RGB"))
 
 
     # 1. Preprocess the image for the model
-    img_resized = cv2.resize(input_image_np, IMG_SIZE)
-    img_normalized = img_resized.astype(np.float32) / 255.0
-    img_batch = np.expand_dims(img_normalized, axis=0) # Create a batch of 1
+    with tracer.span('resize'):
+        img_resized = cv2.resize(input_image_np, IMG_SIZE)
+        img_normalized = img_resized.astype(np.float32) / 255.0
+        img_batch = np.expand_dims(img_normalized, axis=0) # Create a batch of 1
 
     # 2. Get model predictions
-    predictions = model.predict(img_batch)[0] # Get probabilities for the first (only) image in batch
+    with tracer.span('predict'):
+        predictions = model.predict(img_batch)[0] # Get probabilities for the first (only) image in batch
 
     # Format predictions as a dictionary for easier display
     output_predictions = {SELECTED_CONDITIONS[i]: float(predictions[i]) for i in range(len(SELECTED_CONDITIONS))}
@@ -114,9 +132,12 @@ def predict_and_visualize_xray(input_image_pil):
 
     for i, condition_name in enumerate(SELECTED_CONDITIONS):
         class_index = i
-        heatmap = grad_cam(model, img_batch, class_index, GRAD_CAM_TARGET_LAYER_NAME)
-        overlay = overlay_gradcam(img_resized, heatmap) # Pass img_resized (0-255 range)
+        with tracer.span('grad_cam'):
+            heatmap = grad_cam(model, img_batch, class_index, GRAD_CAM_TARGET_LAYER_NAME)
+        with tracer.span('overlay_gradcam'):
+            overlay = overlay_gradcam(img_resized, heatmap) # Pass img_resized (0-255 range)
         if overlay is None: # Handle potential errors in Grad-CAM generation
+            tracer.inc('gradcam_fallbacks')
             # Create a placeholder image if overlay fails
             overlay = np.zeros((IMG_SIZE[0], IMG_SIZE[1], 3), dtype=np.uint8)
             cv2.putText(overlay, "Grad-CAM Error", (10, IMG_SIZE[0]//2), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255,0,0), 1)
@@ -175,6 +196,7 @@ else:
 # --- Launch the App ---
 if __name__ == "__main__":
     if model is not None:
+        configure_tracing(metrics_port=METRICS_PORT, trace_file=TRACE_FILE)
         print("Launching Gradio app...")
         app_interface.launch()
     else:
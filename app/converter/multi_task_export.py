@@ -0,0 +1,263 @@
+"""
+Exports the PyTorch MultiTaskModel to TorchScript and ONNX and serves it with ONNX Runtime.
+
+Two graphs are produced:
+  * classification: (N, 3, 224, 224) float32 -> (N, 14) sigmoid probabilities, dynamic batch
+  * detection: (3, 224, 224) float32 -> boxes (K, 4), labels (K,), scores (K,), dynamic K
+
+Both graphs expect the validation preprocessing used in training: resize to 256,
+centre-crop 224 and ImageNet mean/std normalisation. `preprocess` applies it on the
+host. The detector was built with min_size = max_size = 224, so its internal resize
+is a no-op for these inputs. Boxes are mapped back through the crop offset and the
+resize scale to the original resolution afterwards.
+
+Run with the ai/models/multi_task package importable as `src`, e.g.:
+    python multi_task_export.py --weights best_model.pth --output_dir multi_task_export \
+        --sample_images xray1.png xray2.png
+"""
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+import torch
+import onnxruntime as ort
+from src.models import MultiTaskModel
+
+IMG_SIZE = 224
+RESIZE_SIZE = 256
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+NUM_CLASSES = 14
+OPSET_VERSION = 17
+
+
+class ClassificationGraph(torch.nn.Module):
+    """Classification branch only, with the sigmoid folded into the graph."""
+    def __init__(self, model):
+        super(ClassificationGraph, self).__init__()
+        self.model = model
+
+    def forward(self, images):
+        return torch.sigmoid(self.model(images, mode='classification'))
+
+
+class DetectionGraph(torch.nn.Module):
+    """Single-image Faster R-CNN inference returning flat (boxes, labels, scores) tensors."""
+    def __init__(self, model):
+        super(DetectionGraph, self).__init__()
+        self.detector = model.detector
+
+    def forward(self, image):
+        if torch.jit.is_scripting():
+            # Scripted GeneralizedRCNN returns (losses, detections)
+            _, detections = self.detector([image])
+        else:
+            detections = self.detector([image])
+        return detections[0]['boxes'], detections[0]['labels'], detections[0]['scores']
+
+
+def load_model(weights_path):
+    model = MultiTaskModel(num_classes=NUM_CLASSES, pretrained=False)
+    model.load_state_dict(torch.load(weights_path, map_location='cpu'))
+    return model.eval()
+
+
+def export_model(model, output_dir):
+    """Writes TorchScript (.pt) and ONNX (.onnx) files for both graphs; returns their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {name: os.path.join(output_dir, name) for name in
+             ['classification.pt', 'classification.onnx', 'detection.pt', 'detection.onnx']}
+
+    cls_graph = ClassificationGraph(model).eval()
+    det_graph = DetectionGraph(model).eval()
+    dummy_batch = torch.rand(2, 3, IMG_SIZE, IMG_SIZE)
+    dummy_image = torch.rand(3, IMG_SIZE, IMG_SIZE)
+
+    with torch.no_grad():
+        torch.jit.trace(cls_graph, dummy_batch).save(paths['classification.pt'])
+        torch.onnx.export(
+            cls_graph, dummy_batch, paths['classification.onnx'],
+            input_names=['images'], output_names=['probabilities'],
+            dynamic_axes={'images': {0: 'batch'}, 'probabilities': {0: 'batch'}},
+            opset_version=OPSET_VERSION
+        )
+
+        # Scripting (not tracing) keeps the data-dependent NMS and box-count logic intact
+        torch.jit.script(det_graph).save(paths['detection.pt'])
+        torch.onnx.export(
+            det_graph, (dummy_image,), paths['detection.onnx'],
+            input_names=['image'], output_names=['boxes', 'labels', 'scores'],
+            dynamic_axes={'boxes': {0: 'num_detections'}, 'labels': {0: 'num_detections'},
+                          'scores': {0: 'num_detections'}},
+            opset_version=OPSET_VERSION
+        )
+
+    for name, path in paths.items():
+        print(f"Saved {name} ({os.path.getsize(path) / (1024 * 1024):.2f} MB)")
+    return paths
+
+
+def preprocess(image_rgb):
+    """
+    Applies the validation transform (resize 256, centre-crop 224, ImageNet normalisation)
+    to an RGB uint8 image and returns a (3, 224, 224) float32 array.
+    """
+    offset = (RESIZE_SIZE - IMG_SIZE) // 2
+    resized = cv2.resize(image_rgb, (RESIZE_SIZE, RESIZE_SIZE))
+    cropped = resized[offset:offset + IMG_SIZE, offset:offset + IMG_SIZE].astype(np.float32) / 255.0
+    normalized = (cropped - IMAGENET_MEAN) / IMAGENET_STD
+    return np.ascontiguousarray(normalized.transpose(2, 0, 1), dtype=np.float32)
+
+
+def boxes_to_original(boxes, original_size):
+    """Maps (K, 4) boxes on the 224 crop back to an (h, w) original image, inverting `preprocess`."""
+    h, w = original_size
+    offset = (RESIZE_SIZE - IMG_SIZE) // 2
+    scale = np.array([w / RESIZE_SIZE, h / RESIZE_SIZE, w / RESIZE_SIZE, h / RESIZE_SIZE], dtype=np.float32)
+    return (boxes + offset) * scale
+
+
+class OnnxMultiTaskRuntime:
+    """CPU ONNX Runtime sessions for the exported classification and detection graphs."""
+    def __init__(self, output_dir, num_threads=None):
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        providers = ['CPUExecutionProvider']
+        self.cls_session = ort.InferenceSession(os.path.join(output_dir, 'classification.onnx'), options, providers=providers)
+        self.det_session = ort.InferenceSession(os.path.join(output_dir, 'detection.onnx'), options, providers=providers)
+
+    def classify(self, images):
+        """images: (N, 3, 224, 224) float32 -> (N, 14) probabilities."""
+        return self.cls_session.run(None, {'images': images})[0]
+
+    def detect(self, image, original_size=None):
+        """image: (3, 224, 224) float32 -> dict of boxes (scaled to `original_size` (h, w) if given), labels, scores."""
+        boxes, labels, scores = self.det_session.run(None, {'image': image})
+        if original_size is not None:
+            boxes = boxes_to_original(boxes, original_size)
+        return {'boxes': boxes, 'labels': labels, 'scores': scores}
+
+    def predict(self, image_rgb):
+        """Full pipeline for one RGB uint8 image of any size."""
+        image = preprocess(image_rgb)
+        probs = self.classify(image[np.newaxis])[0]
+        return probs, self.detect(image, original_size=image_rgb.shape[:2])
+
+
+def load_sample_images(image_paths):
+    """Reads images from disk and returns them preprocessed as a (N, 3, 224, 224) float32 tensor."""
+    images = []
+    for path in image_paths:
+        image_bgr = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image_bgr is None:
+            raise ValueError(f"Could not read image {path}")
+        images.append(preprocess(cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)))
+    return torch.from_numpy(np.stack(images))
+
+
+def check_parity(model, runtime, output_dir, images, atol=1e-4, box_atol=1e-2, score_atol=1e-4):
+    """
+    Compares eager, TorchScript and ONNX Runtime outputs on real X-rays, given as image
+    paths or a (N, 3, 224, 224) tensor built with `preprocess`. Random noise rarely yields any
+    detections, so parity only passes if at least one image produced boxes to compare,
+    and those boxes, labels and scores agree within tolerance.
+    """
+    if not isinstance(images, torch.Tensor):
+        images = load_sample_images(images)
+    scripted_cls = torch.jit.load(os.path.join(output_dir, 'classification.pt'))
+    scripted_det = torch.jit.load(os.path.join(output_dir, 'detection.pt'))
+    det_graph = DetectionGraph(model).eval()
+
+    with torch.no_grad():
+        eager_probs = ClassificationGraph(model)(images).numpy()
+        script_probs = scripted_cls(images).numpy()
+    onnx_probs = runtime.classify(images.numpy())
+
+    results = {
+        'cls_torchscript_max_diff': float(np.abs(eager_probs - script_probs).max()),
+        'cls_onnx_max_diff': float(np.abs(eager_probs - onnx_probs).max()),
+        'det_compared': 0,
+        'det_count_mismatches': 0,
+        'det_label_mismatches': 0,
+        'det_max_box_diff': 0.0,
+        'det_max_score_diff': 0.0
+    }
+    for image in images:
+        with torch.no_grad():
+            eager = [t.numpy() for t in det_graph(image)]
+            scripted = [t.numpy() for t in scripted_det(image)]
+        onnx_out = runtime.detect(image.numpy())
+        onnx_out = [onnx_out['boxes'], onnx_out['labels'], onnx_out['scores']]
+
+        for boxes, labels, scores in (scripted, onnx_out):
+            if len(boxes) != len(eager[0]):
+                results['det_count_mismatches'] += 1
+                continue
+            if not len(boxes):
+                continue
+            results['det_compared'] += 1
+            results['det_label_mismatches'] += int(np.sum(labels != eager[1]))
+            results['det_max_box_diff'] = max(results['det_max_box_diff'], float(np.abs(boxes - eager[0]).max()))
+            results['det_max_score_diff'] = max(results['det_max_score_diff'], float(np.abs(scores - eager[2]).max()))
+
+    results['passed'] = (results['cls_torchscript_max_diff'] <= atol and results['cls_onnx_max_diff'] <= atol
+                         and results['det_compared'] > 0 and results['det_count_mismatches'] == 0
+                         and results['det_label_mismatches'] == 0
+                         and results['det_max_box_diff'] <= box_atol and results['det_max_score_diff'] <= score_atol)
+    print("Parity:", results)
+    return results
+
+
+def _time(fn, runs, warmup=3):
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return 1000 * (time.perf_counter() - start) / runs
+
+
+def benchmark(model, runtime, output_dir, runs=20):
+    """Mean single-image latency (ms) of eager, TorchScript and ONNX Runtime for both graphs."""
+    image = torch.rand(3, IMG_SIZE, IMG_SIZE)
+    batch = image[None]
+    image_np, batch_np = image.numpy(), batch.numpy()
+    cls_graph, det_graph = ClassificationGraph(model).eval(), DetectionGraph(model).eval()
+    scripted_cls = torch.jit.load(os.path.join(output_dir, 'classification.pt'))
+    scripted_det = torch.jit.load(os.path.join(output_dir, 'detection.pt'))
+
+    with torch.no_grad():
+        results = {
+            'cls_eager_ms': _time(lambda: cls_graph(batch), runs),
+            'cls_torchscript_ms': _time(lambda: scripted_cls(batch), runs),
+            'cls_onnx_ms': _time(lambda: runtime.classify(batch_np), runs),
+            'det_eager_ms': _time(lambda: det_graph(image), runs),
+            'det_torchscript_ms': _time(lambda: scripted_det(image), runs),
+            'det_onnx_ms': _time(lambda: runtime.detect(image_np), runs),
+        }
+    for name, value in results.items():
+        print(f"{name}: {value:.2f}")
+    return results
+
+
+def main(args):
+    torch.set_num_threads(args.num_threads or torch.get_num_threads())
+    model = load_model(args.weights)
+    export_model(model, args.output_dir)
+    runtime = OnnxMultiTaskRuntime(args.output_dir, num_threads=args.num_threads)
+    check_parity(model, runtime, args.output_dir, args.sample_images)
+    benchmark(model, runtime, args.output_dir, runs=args.runs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export MultiTaskModel to TorchScript/ONNX and benchmark ONNX Runtime")
+    parser.add_argument('--weights', type=str, required=True, help='Path to the MultiTaskModel state_dict (.pth)')
+    parser.add_argument('--output_dir', type=str, default='multi_task_export')
+    parser.add_argument('--num_threads', type=int, default=None, help='Intra-op threads for torch and ONNX Runtime')
+    parser.add_argument('--sample_images', type=str, nargs='+', required=True,
+                        help='Real X-ray images (ideally with findings) used for the parity check')
+    parser.add_argument('--runs', type=int, default=20, help='Timed iterations per benchmark')
+    args = parser.parse_args()
+    main(args)
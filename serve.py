@@ -0,0 +1,286 @@
+"""
+Multi-process inference server for the chest X-ray classifier.
+
+A front dispatcher accepts POST /predict requests (raw PNG/JPEG bytes) and
+balances them across N worker processes. Each worker is pinned to its own
+CPU subset and runs the TFLite flatbuffer produced by app/converter/main.py
+with a matching intra-op thread count. TFLite memory-maps the model file, so
+the read-only weights live once in the page cache and are shared by every
+worker instead of being copied per process.
+
+The default XNNPACK delegate would undo that sharing: it repacks every weight
+tensor into a private per-process buffer. Workers therefore use the builtin
+kernels unless --xnnpack is given, which trades per-worker RSS for the
+delegate's faster kernels. Compare throughput with and without the flag on the
+target host before choosing.
+
+Usage:
+    python serve.py --model model.tflite --workers 4 --port 8000 [--xnnpack]
+"""
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import multiprocessing.connection as mp_connection
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tracing import configure as configure_tracing, tracer
+
+# --- Configuration ---
+MODEL_PATH = 'model.tflite'
+IMG_SIZE = (224, 224)
+SELECTED_CONDITIONS = [
+    "Atelectasis", "Cardiomegaly", "Consolidation", "Edema", "Effusion",
+    "Emphysema", "Fibrosis", "Hernia", "Infiltration", "Mass",
+    "Nodule", "Pleural_Thickening", "Pneumonia", "Pneumothorax"
+]
+
+
+def cpu_partitions(num_workers):
+    """Splits the CPUs available to this process into `num_workers` contiguous subsets."""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+    num_workers = max(1, min(num_workers, len(cpus)))
+    chunk, extra = divmod(len(cpus), num_workers)
+    partitions, start = [], 0
+    for i in range(num_workers):
+        end = start + chunk + (1 if i < extra else 0)
+        partitions.append(cpus[start:end])
+        start = end
+    return partitions
+
+
+def worker_main(worker_id, cpus, model_path, request_queue, response_conn, use_xnnpack=False):
+    """Worker loop: pin to `cpus`, load the shared model, and serve requests until a None sentinel."""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    num_threads = len(cpus)
+    os.environ['OMP_NUM_THREADS'] = str(num_threads)
+
+    # Import heavy dependencies only after pinning so their thread pools size themselves to `cpus`
+    import cv2
+    import numpy as np
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    # Without the default XNNPACK delegate, kernels read weights straight from the shared mmap
+    op_resolver_type = (tf.lite.experimental.OpResolverType.AUTO if use_xnnpack
+                        else tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES)
+    interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads,
+                                      experimental_op_resolver_type=op_resolver_type)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+    print(f"Worker {worker_id} (pid {os.getpid()}) ready on CPUs {cpus} (xnnpack={use_xnnpack})")
+
+    while True:
+        item = request_queue.get()
+        if item is None:
+            break
+        request_id, image_bytes = item
+        try:
+            image_bgr = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if image_bgr is None:
+                raise ValueError("Could not decode image")
+            img_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+            img_resized = cv2.resize(img_rgb, IMG_SIZE)
+            img_batch = np.expand_dims(img_resized.astype(np.float32) / 255.0, axis=0)
+
+            interpreter.set_tensor(input_index, img_batch)
+            interpreter.invoke()
+            predictions = interpreter.get_tensor(output_index)[0]
+            result = {SELECTED_CONDITIONS[i]: float(p) for i, p in enumerate(predictions[:len(SELECTED_CONDITIONS)])}
+            response_conn.send((request_id, result, None))
+        except Exception as e:
+            response_conn.send((request_id, None, str(e)))
+
+
+class Dispatcher:
+    """
+    Routes requests to the live worker with the fewest outstanding requests. Workers that
+    die are restarted on their CPU subset, and the requests they were holding fail
+    immediately instead of waiting out the handler timeout.
+
+    Each worker answers on its own pipe rather than a shared queue, so a worker that
+    crashes mid-write cannot leave a lock held that every other worker then blocks on.
+    """
+    def __init__(self, model_path, num_workers, use_xnnpack=False, health_interval=1.0):
+        # 'spawn' avoids inheriting a half-initialised TensorFlow runtime from the parent
+        self.ctx = mp.get_context('spawn')
+        self.model_path = model_path
+        self.use_xnnpack = use_xnnpack
+        self.health_interval = health_interval
+        self.partitions = cpu_partitions(num_workers)
+        self.request_queues = [None] * len(self.partitions)
+        self.response_conns = [None] * len(self.partitions)
+        self.retired_conns = []  # Read ends of replaced workers; closed by the collector, which may be waiting on them
+        self.processes = [None] * len(self.partitions)
+        self.assigned = [set() for _ in self.partitions]  # request ids each worker still owes a response for
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.request_ids = itertools.count()
+        self.closing = False
+
+        for worker_id in range(len(self.partitions)):
+            self._start_worker(worker_id)
+
+        self.collector = threading.Thread(target=self._collect, name='response-collector', daemon=True)
+        self.collector.start()
+
+    def _start_worker(self, worker_id):
+        request_queue = self.ctx.Queue()
+        response_conn, worker_conn = self.ctx.Pipe(duplex=False)
+        process = self.ctx.Process(
+            target=worker_main,
+            args=(worker_id, self.partitions[worker_id], self.model_path, request_queue,
+                  worker_conn, self.use_xnnpack),
+            daemon=True
+        )
+        process.start()
+        worker_conn.close()  # The worker holds the only write end, so its death shows up as EOF
+        self.request_queues[worker_id] = request_queue
+        self.response_conns[worker_id] = response_conn
+        self.processes[worker_id] = process
+
+    def _restart_dead_workers(self):
+        """Fails the requests held by dead workers and starts replacements. Caller holds the lock."""
+        if self.closing:
+            return
+        for worker_id, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            print(f"Worker {worker_id} (pid {process.pid}) exited with code {process.exitcode}, restarting")
+            tracer.inc('worker_restarts')
+            for request_id in self.assigned[worker_id]:
+                future = self.pending.pop(request_id, None)
+                if future is not None:
+                    future.set_exception(RuntimeError(f"Worker {worker_id} died while handling the request"))
+            self.assigned[worker_id].clear()
+            self.retired_conns.append(self.response_conns[worker_id])
+            self._start_worker(worker_id)
+
+    def submit(self, image_bytes):
+        """Queues one image; returns (request_id, future)."""
+        future = Future()
+        with self.lock:
+            self._restart_dead_workers()
+            request_id = next(self.request_ids)
+            worker_id = min(range(len(self.assigned)), key=lambda i: len(self.assigned[i]))
+            self.assigned[worker_id].add(request_id)
+            self.pending[request_id] = future
+            request_queue = self.request_queues[worker_id]
+        request_queue.put((request_id, image_bytes))
+        return request_id, future
+
+    def predict(self, image_bytes, timeout):
+        """Submits an image and waits for its result; a timed-out request is forgotten."""
+        request_id, future = self.submit(image_bytes)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self.lock:
+                # The worker still counts as busy until it answers; its late response is dropped
+                self.pending.pop(request_id, None)
+            raise
+
+    def _collect(self):
+        while not self.closing:
+            with self.lock:
+                for conn in self.retired_conns:
+                    conn.close()
+                self.retired_conns.clear()
+                conns = {conn: worker_id for worker_id, conn in enumerate(self.response_conns)}
+            for conn in mp_connection.wait(list(conns), timeout=self.health_interval):
+                worker_id = conns[conn]
+                try:
+                    request_id, result, error = conn.recv()
+                except EOFError:
+                    # The worker exited; it is replaced once its process is reaped below
+                    conns[conn] = None
+                    continue
+                with self.lock:
+                    self.assigned[worker_id].discard(request_id)
+                    future = self.pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if error is not None:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(result)
+            with self.lock:
+                self._restart_dead_workers()
+            if None in conns.values():
+                time.sleep(0.01)
+
+    def shutdown(self):
+        with self.lock:
+            self.closing = True
+        for request_queue in self.request_queues:
+            request_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+        self.collector.join(timeout=self.health_interval + 1)
+
+
+def make_handler(dispatcher, timeout):
+    class PredictHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/predict':
+                self.send_error(404)
+                return
+            tracer.inc('requests')
+            try:
+                with tracer.span('dispatch'):
+                    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    result = dispatcher.predict(body, timeout)
+                self._send_json(200, {'predictions': result})
+            except Exception as e:
+                tracer.inc('errors')
+                self._send_json(500, {'error': str(e)})
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PredictHandler
+
+
+def main(args):
+    configure_tracing(metrics_port=args.metrics_port)
+    dispatcher = Dispatcher(args.model, args.workers, use_xnnpack=args.xnnpack)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(dispatcher, args.timeout))
+    print(f"Serving {args.model} with {len(dispatcher.processes)} workers on http://{args.host}:{args.port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dispatcher.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Multi-process Chest X-ray inference server")
+    parser.add_argument('--model', type=str, default=MODEL_PATH, help='Path to the TFLite model (memory-mapped by every worker)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    # app.py defaults to 9100, so both servers can run side by side
+    parser.add_argument('--metrics_port', type=int, default=9101, help='Prometheus metrics port (0 to disable)')
+    parser.add_argument('--xnnpack', action='store_true',
+                        help='Use the XNNPACK delegate (faster kernels, but weights are repacked per worker)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,151 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets (seconds) tuned for per-stage inference timings: sub-millisecond
+# conversions up to multi-second Grad-CAM passes on a cold CPU.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus sense."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Tracer:
+    """
+    Collects named spans, per-stage latency histograms and simple counters.
+    A single lock guards all updates; the critical section is a handful of
+    integer increments so overhead on the hot path stays in the microseconds.
+    """
+    def __init__(self, namespace='xray', trace_events_limit=100_000):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._trace_enabled = False
+        self._trace_events = []
+        self._trace_events_limit = trace_events_limit
+        self._pid = os.getpid()
+
+    # --- Recording ---
+    def enable_chrome_trace(self):
+        self._trace_enabled = True
+
+    @contextmanager
+    def span(self, name):
+        """Times the enclosed block and records it under the stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.observe(name, end - start, start)
+
+    def observe(self, name, duration, start=None):
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = Histogram()
+            hist.observe(duration)
+            if self._trace_enabled and len(self._trace_events) < self._trace_events_limit:
+                self._trace_events.append({
+                    'name': name,
+                    'ph': 'X',
+                    'ts': (start if start is not None else time.perf_counter() - duration) * 1e6,
+                    'dur': duration * 1e6,
+                    'pid': self._pid,
+                    'tid': threading.get_ident(),
+                })
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    # --- Exporting ---
+    def render_prometheus(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {name: (h.buckets, list(h.counts), h.total, h.count)
+                          for name, h in self._histograms.items()}
+
+        lines = []
+        for name, value in sorted(counters.items()):
+            metric = f"{self.namespace}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        metric = f"{self.namespace}_stage_latency_seconds"
+        if histograms:
+            lines.append(f"# HELP {metric} Latency of each inference stage.")
+            lines.append(f"# TYPE {metric} histogram")
+        for stage, (buckets, counts, total, count) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def dump_chrome_trace(self, path):
+        """Writes recorded spans as a Chrome trace (open in chrome://tracing or Perfetto)."""
+        with self._lock:
+            events = list(self._trace_events)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f"Wrote {len(events)} trace events to {path}")
+
+    def start_metrics_server(self, port=9100, host='127.0.0.1'):
+        """Serves `/metrics` from a daemon thread so it never blocks the app."""
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = tracer.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the server logs
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+        thread.start()
+        print(f"Metrics available at http://{host}:{port}/metrics")
+        return server
+
+
+tracer = Tracer()
+
+
+def configure(metrics_port=None, trace_file=None):
+    """Starts the metrics endpoint and/or Chrome trace dumping on exit."""
+    if metrics_port:
+        tracer.start_metrics_server(metrics_port)
+    if trace_file:
+        tracer.enable_chrome_trace()
+        atexit.register(tracer.dump_chrome_trace, trace_file)
+    return tracer